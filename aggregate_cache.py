@@ -0,0 +1,164 @@
+import glob
+import json
+import os
+import sys
+
+import numpy as np
+
+from file_hash import file_sha256
+from results_store import read_results_csv
+
+CACHE_VERSION = 2
+DEFAULT_CACHE = os.path.join("results", "aggregate_cache.json")
+# Histogram of relative position by time since start_timer: one-second bins (the last one collects later samples),
+# and positions binned on a signed half-decade log scale, 0 = on the target
+TIME_BIN = 1.0
+N_TIME_BINS = 60
+POSITION_HALF_DECADES = 10
+N_POSITION_BINS = 2 * POSITION_HALF_DECADES + 1
+TARGET_FIELDS = ("trials", "attempts", "samples", "sum_time", "sum_time_sq")
+
+
+def position_bin(position):
+    position = np.asarray(position, dtype=np.float64)
+    half_decades = np.rint(2 * np.log10(1 + np.abs(position))) * np.sign(position)
+    return np.clip(half_decades, -POSITION_HALF_DECADES, POSITION_HALF_DECADES).astype(np.int64) + POSITION_HALF_DECADES
+
+
+def file_stats(path):
+    """Sufficient statistics of one results CSV.
+
+    Every stop_timer call writes a row repeating the trajectory so far, so a trial's last row holds its whole
+    trajectory and every earlier row was a wrong selection. Trial time is the time of its last logged sample.
+    """
+    trials = {}
+    participants = set()
+    for participant, target_word, target_pos, pairs in read_results_csv(path):
+        participants.add(participant)
+        key = (participant, target_word)  # A file can hold several participants who got the same target
+        attempts = trials[key][0] + 1 if key in trials else 1
+        trials[key] = (attempts, pairs)
+
+    histogram = np.zeros((N_TIME_BINS, N_POSITION_BINS), dtype=np.int64)
+    targets = {}
+    for (participant, target_word), (attempts, pairs) in trials.items():
+        total_time = pairs[-1][1] if pairs else 0.0
+        total = targets.setdefault(target_word, dict.fromkeys(TARGET_FIELDS, 0))
+        for field, value in zip(TARGET_FIELDS, (1, attempts, len(pairs), total_time, total_time * total_time)):
+            total[field] += value
+        if pairs:
+            position, t = np.array(pairs, dtype=np.float64).T
+            time_bin = np.minimum((t / TIME_BIN).astype(np.int64), N_TIME_BINS - 1)
+            np.add.at(histogram, (time_bin, position_bin(position)), 1)
+    return {"participants": sorted(participants), "targets": targets, "histogram": histogram.tolist()}
+
+
+class AggregateCache:
+    """Group statistics over a results folder, updated one session file at a time.
+
+    Each file's statistics are stored with its mtime, size and hash; update() only reads files whose mtime or size
+    changed, and only recomputes those whose content hash changed too. Queries add up the stored per-file
+    statistics without touching the CSVs.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except FileNotFoundError:
+            cache = {}
+        self.files = cache.get("files", {}) if cache.get("version") == CACHE_VERSION else {}
+
+    def update(self, results_dir="results"):
+        """Fold new or changed sessions in and drop removed ones; returns the names of the files recomputed"""
+        changed = []
+        touched = False
+        seen = set()
+        for path in sorted(glob.glob(os.path.join(results_dir, "*.csv"))):
+            name = os.path.basename(path)
+            seen.add(name)
+            stat = os.stat(path)
+            entry = self.files.get(name)
+            if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                continue
+            sha256 = file_sha256(path)
+            if entry and entry["sha256"] == sha256:
+                entry["mtime_ns"] = stat.st_mtime_ns  # Touched or copied, same content
+                touched = True
+                continue
+            self.files[name] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha256,
+                                "stats": file_stats(path)}
+            changed.append(name)
+        removed = set(self.files) - seen
+        for name in removed:
+            del self.files[name]
+        if changed or removed or touched or not os.path.exists(self.path):
+            self.save()
+        return changed
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "files": self.files}, f)
+        os.replace(tmp_path, self.path)
+
+    def targets(self):
+        """Per-target totals of TARGET_FIELDS"""
+        totals = {}
+        for entry in self.files.values():
+            for target_word, stats in entry["stats"]["targets"].items():
+                total = totals.setdefault(target_word, dict.fromkeys(TARGET_FIELDS, 0))
+                for field in TARGET_FIELDS:
+                    total[field] += stats[field]
+        return totals
+
+    def target_difficulty(self):
+        """Per target: trials, mean and standard deviation of search time, wrong selections per trial, samples per trial"""
+        difficulty = {}
+        for target_word, total in self.targets().items():
+            n = total["trials"]
+            mean = total["sum_time"] / n
+            difficulty[target_word] = {
+                "trials": n,
+                "mean_time": mean,
+                "std_time": max(total["sum_time_sq"] / n - mean * mean, 0.0) ** 0.5,
+                "errors_per_trial": (total["attempts"] - n) / n,
+                "samples_per_trial": total["samples"] / n,
+            }
+        return difficulty
+
+    def position_histogram(self):
+        """Logged samples per (time bin, position bin), summed over every session"""
+        histogram = np.zeros((N_TIME_BINS, N_POSITION_BINS), dtype=np.int64)
+        for entry in self.files.values():
+            histogram += np.array(entry["stats"]["histogram"], dtype=np.int64)
+        return histogram
+
+    def summary(self):
+        participants = set()
+        for entry in self.files.values():
+            participants.update(entry["stats"]["participants"])
+        totals = self.targets()
+        trials = sum(total["trials"] for total in totals.values())
+        attempts = sum(total["attempts"] for total in totals.values())
+        sum_time = sum(total["sum_time"] for total in totals.values())
+        return {
+            "sessions": len(self.files),
+            "participants": len(participants),
+            "trials": trials,
+            "wrong_selections": attempts - trials,
+            "samples": sum(total["samples"] for total in totals.values()),
+            "mean_time": sum_time / trials if trials else float("nan"),
+        }
+
+
+if __name__ == "__main__":
+    results_dir = sys.argv[1] if len(sys.argv) > 1 else "results"
+    cache = AggregateCache(os.path.join(results_dir, os.path.basename(DEFAULT_CACHE)))
+    changed = cache.update(results_dir)
+    print(f"Folded in {len(changed)} new or changed sessions")
+    print(json.dumps(cache.summary()))
+    for target_word, stats in sorted(cache.target_difficulty().items(), key=lambda item: -item[1]["mean_time"]):
+        print(f"  {target_word:<15} trials={stats['trials']:<4} mean={stats['mean_time']:.2f}s "
+              f"sd={stats['std_time']:.2f}s errors/trial={stats['errors_per_trial']:.2f}")
@@ -0,0 +1,221 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from dictionarycleaner import clean_dictionary, clean_dictionary_streaming
+from lexicon import collation_key, compile_lexicon, load_lexicon
+from results_store import RESULTS_HEADER, build_columns, read_results_csv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "expiremental_environment"))
+from perf_probes import percentiles
+from replay_harness import VARIANTS, replay, synthetic_session
+from upload_cvs_to_GCS import LocalStorage, upload_csvs_to_gcs
+
+SIZES = {"5k": 5_000, "20k": 20_000, "300k": 300_000, "1M": 1_000_000}
+DEFAULT_BASELINE = "benchmark_baseline.json"
+# A timing more than this fraction slower than the baseline is reported as a regression
+DEFAULT_TOLERANCE = 0.25
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz" * 4 + "éèêàâçôîû"
+SUFFIXES = ["s", "e", "er", "ment", "tion", "eur", "euse", "age", "ité", "able"]
+
+
+def synthetic_words(n, seed=0):
+    """n distinct pseudo-French words, about a third of them derived from an earlier stem, in collation order"""
+    rng = random.Random(seed)
+    words = set()
+    stems = []
+    while len(words) < n:
+        if stems and rng.random() < 0.3:
+            word = rng.choice(stems) + rng.choice(SUFFIXES)
+        else:
+            word = "".join(rng.choice(LETTERS) for _ in range(rng.randint(3, 10)))
+            stems.append(word)
+        words.add(word)
+    return sorted(words, key=collation_key)
+
+
+def write_words(path, words):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        for word in words:
+            writer.writerow([word])
+    return path
+
+
+def write_results_corpus(results_dir, words, n_sessions, seed=0):
+    """Sessions in the format stop_timer writes: five targets each, some with wrong selections before the right one"""
+    rng = random.Random(seed)
+    os.makedirs(results_dir, exist_ok=True)
+    for session in range(n_sessions):
+        with open(os.path.join(results_dir, f"p{session}_at_20250101_000000.csv"), "w", encoding="utf-8",
+                  newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(RESULTS_HEADER)
+            for target_pos in rng.sample(range(len(words)), 5):
+                t = 0.0
+                written = 0
+                pairs = []
+                position = -target_pos
+                for attempt in range(rng.choice([1, 1, 1, 2, 3])):
+                    for _ in range(rng.randint(3, 15)):
+                        t = round(t + rng.uniform(0.2, 2.0), 2)
+                        position = int(position * rng.uniform(-0.6, 0.6))
+                        pairs.append([position, t])
+                    writer.writerow([session, words[target_pos], target_pos, pairs[written:], words[target_pos],
+                                     "", 0, written])
+                    written = len(pairs)
+    return results_dir
+
+
+def timed(func, repeat):
+    """min and median wall time in seconds over `repeat` runs"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"min_s": round(min(times), 6), "median_s": round(statistics.median(times), 6)}
+
+
+def bench_cleaner(work_dir, label, words, repeat):
+    shuffled = list(words)
+    random.Random(1).shuffle(shuffled)
+    source = write_words(os.path.join(work_dir, f"raw_{label}.csv"), shuffled)
+    output = os.path.join(work_dir, f"cleaned_{label}.csv")
+    return {
+        f"cleaner/clean_dictionary/{label}": timed(lambda: clean_dictionary(source, output), repeat),
+        f"cleaner/clean_dictionary_streaming/{label}": timed(
+            lambda: clean_dictionary_streaming(source, output, max_memory_mb=16, tmp_dir=work_dir), repeat),
+    }
+
+
+def bench_lexicon(work_dir, label, words, repeat):
+    source = write_words(os.path.join(work_dir, f"lexicon_{label}.csv"), words)
+    lex_path = compile_lexicon(source)
+    rng = random.Random(2)
+    queries = [rng.choice(words) for _ in range(10_000)]
+    folded_queries = [word.upper() for word in queries[:1_000]]
+
+    def load_and_read():
+        lexicon = load_lexicon(lex_path)
+        lexicon[0], lexicon[len(lexicon) - 1]
+        lexicon.close()
+
+    lexicon = load_lexicon(lex_path)
+    results = {
+        f"lexicon/compile/{label}": timed(lambda: compile_lexicon(source, lex_path), repeat),
+        f"lexicon/load/{label}": timed(load_and_read, repeat),
+        f"lexicon/position_10k/{label}": timed(lambda: [lexicon.position(word) for word in queries], repeat),
+        f"lexicon/find_1k/{label}": timed(lambda: [lexicon.find(word) for word in folded_queries], repeat),
+    }
+    lexicon.close()
+    return results
+
+
+def bench_handlers(work_dir, label, sessions):
+    """Per-handler latency percentiles from replayed synthetic sessions, for both interfaces"""
+    lexicon = load_lexicon(os.path.join(work_dir, f"lexicon_{label}.lex"))
+    results = {}
+    for variant in VARIANTS:
+        merged = {}
+        start = time.perf_counter()
+        for seed in range(sessions):
+            for name, values in replay(variant, lexicon, synthetic_session, seed).items():
+                merged.setdefault(name, []).extend(values)
+        results[f"handlers/{variant}/session/{label}"] = {"min_s": round((time.perf_counter() - start) / sessions, 6)}
+        for name, values in merged.items():
+            results[f"handlers/{variant}/{name}/{label}"] = percentiles(values)
+    return results
+
+
+def bench_results(work_dir, words, n_sessions, repeat):
+    results_dir = write_results_corpus(os.path.join(work_dir, "results"), words, n_sessions)
+    paths = sorted(os.path.join(results_dir, name) for name in os.listdir(results_dir))
+    bucket = os.path.join(work_dir, "bucket")
+    manifest = os.path.join(work_dir, "manifest.json")
+
+    def upload(**options):
+        if os.path.exists(manifest):
+            os.remove(manifest)  # Every run uploads the whole corpus
+        with contextlib.redirect_stdout(io.StringIO()):  # One line per uploaded file
+            upload_csvs_to_gcs(results_dir, LocalStorage(bucket), manifest_path=manifest, **options)
+
+    label = f"{n_sessions}_sessions"
+    return {
+        f"results/read_csv/{label}": timed(lambda: [list(read_results_csv(path)) for path in paths], repeat),
+        f"results/build_columns/{label}": timed(lambda: build_columns(paths), repeat),
+        f"upload/files/{label}": timed(lambda: upload(), repeat),
+        f"upload/gzip/{label}": timed(lambda: upload(compress=True), repeat),
+        f"upload/pack/{label}": timed(lambda: upload(pack=True), repeat),
+    }
+
+
+def run(sizes, repeat=3, sessions=2, n_result_sessions=500):
+    report = {"meta": {"date": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                       "machine": platform.machine(), "platform": platform.platform(), "repeat": repeat},
+              "results": {}}
+    results = report["results"]
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as work_dir:
+        for label in sizes:
+            words = synthetic_words(SIZES[label])
+            print(f"[{label}] cleaner, lexicon, handlers", file=sys.stderr)
+            results.update(bench_cleaner(work_dir, label, words, repeat))
+            results.update(bench_lexicon(work_dir, label, words, repeat))
+            results.update(bench_handlers(work_dir, label, sessions))
+        print(f"results parsing and upload ({n_result_sessions} sessions)", file=sys.stderr)
+        results.update(bench_results(work_dir, synthetic_words(SIZES["5k"]), n_result_sessions, repeat))
+    return report
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """[(name, metric, baseline value, current value)] for every timing slower than the baseline by > tolerance"""
+    regressions = []
+    for name, current in report["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        metric = "min_s" if "min_s" in current else "p50_us"
+        if previous.get(metric) and current[metric] > previous[metric] * (1 + tolerance):
+            regressions.append((name, metric, previous[metric], current[metric]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the cleaner, lexicon loading, interface handlers, results "
+                                                 "parsing and upload packing on synthetic data")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sessions", type=int, default=2, help="replayed sessions per interface and lexicon size")
+    parser.add_argument("--result-sessions", type=int, default=500, help="sessions in the synthetic results corpus")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.repeat, args.sessions, args.result_sessions)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"Wrote {len(report['results'])} timings to {args.output}")
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"Saved as baseline {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for name, metric, previous, current in regressions:
+            print(f"REGRESSION {name}: {metric} {previous} -> {current}")
+        print(f"{len(regressions)} regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+        sys.exit(1 if regressions else 0)
@@ -1,28 +1,161 @@
 import csv
+import heapq
+import os
+import sys
+import tempfile
+
+from lexicon import collation_key
+
+# Marks a trie node that closes a base word
+_END = None
+
+
+class BaseWordTrie:
+    """Character trie of base words, used to find the shortest base prefix of a word in O(len(word))"""
+
+    def __init__(self):
+        self.root = {}
+        self.words = []  # Base words in insertion order
+
+    def shortest_prefix(self, word):
+        node = self.root
+        for i, char in enumerate(word):
+            node = node.get(char)
+            if node is None:
+                return None
+            if _END in node:
+                return word[:i + 1]
+        return None
+
+    def add(self, word):
+        node = self.root
+        for char in word:
+            node = node.setdefault(char, {})
+        if _END not in node:
+            node[_END] = True
+            self.words.append(word)
+
+    def __contains__(self, word):
+        node = self.root
+        for char in word:
+            node = node.get(char)
+            if node is None:
+                return False
+        return _END in node
+
+    def __len__(self):
+        return len(self.words)
+
+    def __iter__(self):
+        return iter(self.words)
+
 
 def clean_dictionary(input_file, output_file):
-    base_words = set()
+    # Each word is reduced to its shortest prefix found anywhere in the input, like clean_dictionary_streaming,
+    # so the result does not depend on row order
+    words = BaseWordTrie()
+    for word in _read_words(input_file):
+        words.add(word)
+    base_words = {find_base_word(word, words) for word in words}
+
+    with open(output_file, 'w', encoding='utf-8', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        for word in sorted(base_words, key=collation_key):
+            writer.writerow([word])
+
+def find_base_word(word, base_words):
+    # Shortest base word that prefixes `word`, so the result no longer depends on set order
+    base = base_words.shortest_prefix(word)
+    return base if base is not None else word
 
+
+def _read_words(input_file):
     with open(input_file, 'r', encoding='utf-8') as csvfile:
         reader = csv.reader(csvfile)
         for row in reader:
-            if row:  # Ensure the row is not empty
-                word = row[0].strip()
-                base_word = find_base_word(word, base_words)
-                base_words.add(base_word)
+            word = row[0].strip() if row else ""
+            if word:  # Skip empty and blank rows: "" would prefix every word
+                yield word
 
-    with open(output_file, 'w', encoding='utf-8', newline='') as csvfile:
+
+# ----------- Streaming mode (bounded memory) ------------
+MERGE_FAN_IN = 64  # Max number of runs opened at once during a merge pass
+
+
+def clean_dictionary_streaming(input_file, output_file, max_memory_mb=256, tmp_dir=None):
+    """Clean a dictionary too large for memory: sorted runs are spilled to disk and prefixes collapse during the merge.
+
+    In code point order every word directly follows its prefixes, so keeping only words that do not start with the
+    last kept base gives each word's shortest prefix present anywhere in the input (not only in earlier rows). The
+    collapsed words are then sorted a second time, in French collation order, like clean_dictionary's output.
+    """
+    max_bytes = max_memory_mb * 1024 * 1024
+    with tempfile.TemporaryDirectory(dir=tmp_dir, prefix="clean_dictionary_") as run_dir:
+        runs = _spill_sorted_runs(input_file, run_dir, max_bytes, "base")
+        collapsed = _merge_all(runs, os.path.join(run_dir, "collapsed.csv"), run_dir)
+        runs = _spill_sorted_runs(collapsed, run_dir, max_bytes, "collated", key=collation_key)
+        _merge_all(runs, output_file, run_dir, key=collation_key)
+
+
+def _merge_all(runs, output_file, run_dir, key=None):
+    while len(runs) > MERGE_FAN_IN:
+        runs = [_merge_runs(runs[i:i + MERGE_FAN_IN], os.path.join(run_dir, f"merge_{len(runs)}_{i}.csv"), key)
+                for i in range(0, len(runs), MERGE_FAN_IN)]
+    return _merge_runs(runs, output_file, key)
+
+
+def _spill_sorted_runs(input_file, run_dir, max_bytes, name, key=None):
+    runs = []
+    chunk = []
+    chunk_bytes = 0
+    for word in _read_words(input_file):
+        chunk.append(word)
+        chunk_bytes += sys.getsizeof(word) + 8  # String plus its list slot
+        if chunk_bytes >= max_bytes:
+            runs.append(_write_run(chunk, os.path.join(run_dir, f"{name}_{len(runs)}.csv"), key))
+            chunk = []
+            chunk_bytes = 0
+    if chunk or not runs:
+        runs.append(_write_run(chunk, os.path.join(run_dir, f"{name}_{len(runs)}.csv"), key))
+    return runs
+
+
+def _write_run(chunk, filename, key=None):
+    """Sort a chunk into a run file; without a key (code point order) prefixes are collapsed on the way"""
+    chunk.sort(key=key)
+    with open(filename, 'w', encoding='utf-8', newline='') as csvfile:
         writer = csv.writer(csvfile)
-        for word in sorted(base_words):
+        for word in chunk if key else _collapse_prefixes(chunk):
             writer.writerow([word])
+    return filename
 
-def find_base_word(word, base_words):
-    for base in base_words:
-        if word == base or word.startswith(base):
-            return base
-    return word
+
+def _merge_runs(run_files, output_file, key=None):
+    files = [open(filename, 'r', encoding='utf-8', newline='') for filename in run_files]
+    try:
+        streams = [(row[0] for row in csv.reader(f) if row) for f in files]
+        with open(output_file, 'w', encoding='utf-8', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            merged = heapq.merge(*streams, key=key)
+            for word in merged if key else _collapse_prefixes(merged):
+                writer.writerow([word])
+    finally:
+        for f in files:
+            f.close()
+    return output_file
+
+
+def _collapse_prefixes(sorted_words):
+    base = None
+    for word in sorted_words:
+        if base is not None and word.startswith(base):
+            continue
+        base = word
+        yield word
 
 if __name__ == "__main__":
     input_file = "big_dictionary.csv"  # Replace with your input CSV file path
     output_file = "cleaned_dictionary.csv"  # Replace with your desired output file path
-    clean_dictionary(input_file, output_file)
\ No newline at end of file
+    clean_dictionary(input_file, output_file)
+    # For multi-GB dumps use the bounded-memory mode instead:
+    # clean_dictionary_streaming(input_file, output_file, max_memory_mb=512)
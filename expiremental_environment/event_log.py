@@ -0,0 +1,171 @@
+# journal binaire des évènements d'une session, et reconstruction hors ligne des position_time_pairs
+
+import argparse
+import csv
+import json
+import queue
+import struct
+import threading
+
+MAGIC = b"EVL1"
+HEADER_LENGTH = struct.Struct("<I")
+# One record per event: monotonic timestamp (ns), dictionary index, event type (padded to 16 bytes)
+RECORD = struct.Struct("<qiB3x")
+
+EVENT_TARGET = 1  # load_next_target, index = target word position
+EVENT_START = 2  # start_timer, index = current position
+EVENT_KEY_LEFT = 3  # prev_word, index = position after the move
+EVENT_KEY_RIGHT = 4  # next_word, index = position after the move
+EVENT_SCALE = 5  # scroll_to from the scale, index = new position
+EVENT_CLICK = 6  # jump_to_click on the scale, index = new position
+EVENT_FOUND = 7  # stop_timer on the target word, index = current position
+EVENT_WRONG = 8  # stop_timer on another word, index = current position
+
+EVENT_NAMES = {
+    EVENT_TARGET: "target", EVENT_START: "start", EVENT_KEY_LEFT: "key_left", EVENT_KEY_RIGHT: "key_right",
+    EVENT_SCALE: "scale", EVENT_CLICK: "click", EVENT_FOUND: "found", EVENT_WRONG: "wrong",
+}
+
+
+class EventLog:
+    """Append-only session event log.
+
+    log() only packs the record into a buffer on the calling (Tk) thread; full buffers are handed to a
+    background thread that does the actual file writes, so logging never waits on the disk.
+    """
+
+    def __init__(self, path, metadata, buffer_records=256):
+        self.path = path
+        self.file = open(path, "wb")
+        header = json.dumps(metadata, ensure_ascii=False).encode("utf-8")
+        self.file.write(MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+        self.file.flush()
+        self.buffer = bytearray()
+        self.buffer_bytes = buffer_records * RECORD.size
+        self.queue = queue.SimpleQueue()
+        self.writer = threading.Thread(target=self._write_loop, name="event-log-writer", daemon=True)
+        self.writer.start()
+
+    def log(self, event_type, index, t_ns):
+        self.buffer += RECORD.pack(t_ns, index, event_type)
+        if len(self.buffer) >= self.buffer_bytes:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.queue.put(bytes(self.buffer))
+            self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        self.queue.put(None)
+        self.writer.join()
+        self.file.close()
+
+    def _write_loop(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            self.file.write(chunk)
+            self.file.flush()
+
+
+def read_event_log(path):
+    """Return (metadata, [(t_ns, index, event_type), ...]); a record cut short by a crash is dropped"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != MAGIC:
+        raise ValueError(f"{path} is not an event log")
+    (header_length,) = HEADER_LENGTH.unpack_from(data, 4)
+    body_start = 4 + HEADER_LENGTH.size + header_length
+    metadata = json.loads(data[4 + HEADER_LENGTH.size:body_start].decode("utf-8"))
+    body_end = body_start + (len(data) - body_start) // RECORD.size * RECORD.size
+    return metadata, list(RECORD.iter_unpack(data[body_start:body_end]))
+
+
+def rebuild_trials(metadata, events, dwell_threshold=1.0):
+    """Replay the events through the same rules as DictionnaireApp and return the rows stop_timer writes.
+
+    With the default threshold the rows match the session CSV as read by results_store.read_results_csv (whole
+    trajectories); other thresholds re-derive the dwell samples (direction reversals are always kept).
+    """
+    dwell_threshold_ns = dwell_threshold * 1e9
+    targets = metadata["target_words"]
+    rows = []
+    target_number = -1
+    target_pos = -1
+    index = 0
+    start_time = experiment_start_time = current_word_start_time = None
+    last_direction = last_position = None
+    data = []
+
+    def view(now):
+        # update_word_view_time
+        if current_word_start_time is not None and experiment_start_time is not None:
+            if now - current_word_start_time >= dwell_threshold_ns:
+                data.append([index - target_pos, round((now - experiment_start_time) / 1e9, 2)])
+
+    def direction_change(direction, now):
+        # detect_direction_change
+        nonlocal last_direction, last_position
+        if experiment_start_time is None:
+            return
+        direction_name = "left" if direction == -1 else "right"
+        if last_direction is not None and last_direction != direction_name:
+            data.append([index - target_pos, round((now - experiment_start_time) / 1e9, 2)])
+        last_direction = direction_name
+        last_position = index
+
+    for now, new_index, event_type in events:
+        if event_type == EVENT_TARGET:
+            target_number += 1
+            target_pos = new_index
+            index = 0
+            data = []
+            start_time = experiment_start_time = None
+            last_direction = None
+            last_position = index
+        elif event_type == EVENT_START:
+            start_time = experiment_start_time = current_word_start_time = now
+            data = []
+            last_direction = None
+            last_position = index
+        elif event_type in (EVENT_KEY_LEFT, EVENT_KEY_RIGHT):
+            view(now)
+            direction_change(-1 if event_type == EVENT_KEY_LEFT else 1, now)
+            index = new_index
+            current_word_start_time = now
+        elif event_type in (EVENT_SCALE, EVENT_CLICK):
+            if new_index == index:
+                continue
+            view(now)
+            if last_position is not None:
+                direction = 1 if new_index > last_position else -1 if new_index < last_position else 0
+                if direction != 0:
+                    direction_change(direction, now)
+            index = new_index
+            current_word_start_time = now
+        elif event_type in (EVENT_FOUND, EVENT_WRONG):
+            if start_time is None:
+                continue
+            view(now)
+            current_word_start_time = now
+            rows.append([metadata["participant_number"], targets[target_number], target_pos, list(data)])
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild position_time_pairs rows from a session event log")
+    parser.add_argument("event_log")
+    parser.add_argument("--dwell", type=float, default=1.0, help="minimum viewing time in seconds (default 1.0)")
+    parser.add_argument("-o", "--output", help="output CSV (default: <event_log>_rebuilt.csv)")
+    args = parser.parse_args()
+
+    metadata, events = read_event_log(args.event_log)
+    output = args.output or args.event_log.rsplit(".", 1)[0] + "_rebuilt.csv"
+    with open(output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["participant_number", "target_word", "target_word_pos", "position_time_pairs"])
+        writer.writerows(rebuild_trials(metadata, events, args.dwell))
+    print(f"Rebuilt {output}")
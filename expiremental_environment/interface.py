@@ -4,29 +4,78 @@ import tkinter as tk
 import time
 import csv
 import random
-from difflib import get_close_matches
 import os
 from datetime import datetime
-
-# import the upload function
-from upload_cvs_to_GCS import *
+import sys
+
+# Shared lexicon tools live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lexicon import load_lexicon, position_index
+from fuzzy_index import classify_wrong_word
+
+# Background upload of finished sessions (google-cloud-storage is only imported by the upload thread)
+from upload_queue import UploadQueue
+from event_log import (EventLog, EVENT_TARGET, EVENT_START, EVENT_KEY_LEFT, EVENT_KEY_RIGHT, EVENT_SCALE,
+                       EVENT_CLICK, EVENT_FOUND, EVENT_WRONG)
+from session_store import SessionStore
+from session_server import SessionClient
+from perf_probes import PerfProbes
+from trajectory_buffer import TrajectoryBuffer
+
+# Word label and scale are redrawn at most once per display frame (~60 Hz)
+RENDER_INTERVAL_MS = 16
+# A word counts as viewed after this long (timestamps are time.monotonic_ns())
+DWELL_THRESHOLD_NS = 1_000_000_000
+# Optional SQLite (WAL) session database shared by the booths, e.g. os.path.join("results", "sessions.db")
+SESSION_DB = None
+# Or stream trials to a session_server.py aggregator instead, e.g. ("192.168.1.10", 8765)
+SESSION_SERVER = None
+# Ship each finished session's files to the GCS bucket in the background (needs google-cloud-storage and credentials)
+UPLOAD_RESULTS = False
+# Neighbouring words shown above and below the current one, like a dictionary page (0 = current word only)
+WORD_WINDOW = 0
+# Time the hot-path handlers and write a <session>.perf.json report next to each session's CSV
+PERF_PROBES = False
+PROBED_METHODS = ["update_word_view_time", "detect_direction_change", "render", "write_trial_row"]
 
 
 class DictionnaireApp:
-    def __init__(self, root, mots):
+    def __init__(self, root, mots, session_db=None, upload_results=False, perf_probes=False, word_window=0,
+                 session_server=None):
         self.root = root
         self.mots = mots
+        # Word -> position index, built once so target lookups don't scan the lexicon
+        self.word_positions = position_index(mots)
+        self.target_pos = -1
         self.index = 0
         self.start_time = None
         self.participant_number = None
         self.current_target_index = 0
         self.target_words = []
-        self.current_experiment_data = []  # Store [position, time] pairs
+        self.current_experiment_data = TrajectoryBuffer()  # Store [position, time] pairs
         self.experiment_start_time = None
         self.csv_file = None
         self.csv_writer = None
+        self.event_log = None
+        self.session_db = session_db
+        self.session_server = session_server
+        self.session_store = None
+        self.session_name = None
+        self.attempt_number = 0
+        self.upload_queue = UploadQueue() if upload_results else None
         self.last_direction = None  # 'left', 'right', or None
         self.last_position = None  # Track last position for direction detection
+        self.render_job = None  # Pending root.after id while a redraw is scheduled
+        self.scale_echo = None  # Value of our last scroll.set(), until Tk echoes it to scroll_to
+        self.word_window = word_window
+        self.window_labels = []  # Fixed pool of 2 * word_window + 1 labels, reused for every position
+        self.window_texts = []  # Text each pooled label currently shows, so unchanged rows aren't reconfigured
+        self.window_fonts = []
+        self.pad_cache = {}  # (font size, first letter) -> left padding
+        # Timed wrappers are only installed when enabled, so the handlers are untouched otherwise
+        self.probes = PerfProbes() if perf_probes else None
+        if self.probes:
+            self.probes.instrument(self, PROBED_METHODS)
 
         self.root.title("Expérience de recherche lexicale")
         self.root.geometry("650x500")
@@ -71,11 +120,30 @@ class DictionnaireApp:
         self.csv_file = open(filename, "w", newline="", encoding="utf-8")
         self.csv_writer = csv.writer(self.csv_file)
         # Write header if needed
-        self.csv_writer.writerow(["participant_number", "target_word", "target_word_pos", "position_time_pairs"])
+        # Each row only holds the pairs logged since the trial's previous row, starting at step first_step;
+        # results_store.read_results_csv expands them back into whole trajectories
+        self.csv_writer.writerow(["participant_number", "target_word", "target_word_pos", "new_position_time_pairs",
+                                  "word_found", "error_type", "edit_distance", "first_step"])
 
         # Hardcoded target words, randomized each run
         all_targets = ["abandon", "perdu", "encadrement", "amour", "service"]
         self.target_words = random.sample(all_targets, len(all_targets))
+
+        # Raw event log next to the CSV, from which event_log.py can rebuild the position_time_pairs
+        self.event_log = EventLog(os.path.splitext(filename)[0] + ".events", {
+            "participant_number": self.participant_number,
+            "target_words": self.target_words,
+            "csv_file": filename,
+            "dictionary_size": len(self.mots),
+        })
+        if self.session_db or self.session_server:
+            if self.session_store is None:
+                self.session_store = (SessionClient(self.session_server) if self.session_server
+                                      else SessionStore(self.session_db))
+            self.session_name = os.path.splitext(os.path.basename(filename))[0]
+            self.session_store.start_session(self.session_name, self.participant_number, timestamp)
+        if self.probes:
+            self.probes.reset()
         self.current_target_index = 0
         self.last_direction = None
         self.last_position = None
@@ -87,17 +155,21 @@ class DictionnaireApp:
         self.label_instruction = tk.Label(self.root, text="", font=("Helvetica", 24, "bold"))
         self.label_instruction.pack(pady=10)
 
-        # Center first letter by adding left padding
-        from tkinter import font as tkFont
-        screen_width = 650  # matches self.root.geometry
-        word = self.mots[self.index]
-        label_font = tkFont.Font(family="Helvetica", size=28)
-        # Measure width of first letter
-        first_letter_width = label_font.measure(word[0]) if word else 0
-        # Calculate left padding so first letter is centered
-        left_pad = int(screen_width / 2 - first_letter_width / 2)
-        self.label = tk.Label(self.root, text=word, font=("Helvetica", 28), anchor="w", justify="left", padx=left_pad)
-        self.label.pack(pady=30)
+        if self.word_window:
+            self.build_word_window()
+        else:
+            # Center first letter by adding left padding
+            from tkinter import font as tkFont
+            screen_width = 650  # matches self.root.geometry
+            word = self.mots[self.index]
+            label_font = tkFont.Font(family="Helvetica", size=28)
+            # Measure width of first letter
+            first_letter_width = label_font.measure(word[0]) if word else 0
+            # Calculate left padding so first letter is centered
+            left_pad = int(screen_width / 2 - first_letter_width / 2)
+            self.label = tk.Label(self.root, text=word, font=("Helvetica", 28), anchor="w", justify="left",
+                                  padx=left_pad)
+            self.label.pack(pady=30)
 
         # Navigation buttons
         frame = tk.Frame(self.root)
@@ -133,13 +205,55 @@ class DictionnaireApp:
         
         self.load_next_target()
 
+    def build_word_window(self):
+        """Sliding page of neighbouring words; the current word is the larger middle row"""
+        from tkinter import font as tkFont
+        window_frame = tk.Frame(self.root)
+        window_frame.pack(pady=10)
+        fonts = {size: tkFont.Font(family="Helvetica", size=size) for size in (28, 14)}
+        self.window_labels = []
+        self.window_texts = []
+        self.window_fonts = []
+        for slot in range(2 * self.word_window + 1):
+            size = 28 if slot == self.word_window else 14
+            self.window_fonts.append(fonts[size])
+            label = tk.Label(window_frame, text="", font=("Helvetica", size), anchor="w", justify="left",
+                             fg="black" if slot == self.word_window else "gray")
+            label.pack(fill="x")
+            self.window_labels.append(label)
+            self.window_texts.append(None)
+        self.label = self.window_labels[self.word_window]
+        self.show_words()
+
+    def left_pad(self, slot, word):
+        """Padding that centers the word's first letter, measured once per font and letter"""
+        key = (slot == self.word_window, word[:1])
+        pad = self.pad_cache.get(key)
+        if pad is None:
+            screen_width = 650  # matches self.root.geometry
+            pad = self.pad_cache[key] = int(screen_width / 2 - self.window_fonts[slot].measure(word[:1]) / 2)
+        return pad
+
+    def show_words(self):
+        if not self.window_labels:
+            self.label.config(text=self.mots[self.index])
+            return
+        first = self.index - self.word_window
+        # One slice of the lexicon per redraw; rows before the first word stay blank
+        words = [""] * max(-first, 0) + self.mots[max(first, 0):self.index + self.word_window + 1]
+        for slot, label in enumerate(self.window_labels):
+            word = words[slot] if slot < len(words) else ""
+            if self.window_texts[slot] != word:
+                self.window_texts[slot] = word
+                label.config(text=word, padx=self.left_pad(slot, word))
+
     def jump_to_click(self, event):
         # Compute the new value based on where the user clicked
         # Works only for horizontal scale
         scale = event.widget
         new_val = int(scale["from"]) + int((int(scale["to"]) - int(scale["from"])) * event.x / scale.winfo_width())
         scale.set(new_val)
-        self.scroll_to(new_val)
+        self.scroll_to(new_val, EVENT_CLICK)
 
     # ----------- Experiment logic ------------
     def load_next_target(self):
@@ -149,12 +263,15 @@ class DictionnaireApp:
 
         # Reset to first dictionary word when starting new target
         self.index = 0
-        self.label.config(text=self.mots[self.index])
-        self.scroll.set(self.index)
+        self.show_words()
+        self.set_scale(self.index)
         
         self.target_word = self.target_words[self.current_target_index]
+        self.target_pos = self.word_positions.get(self.target_word, -1)
+        self.log_event(EVENT_TARGET, self.target_pos, time.monotonic_ns())
+        self.attempt_number = 0
         # Reset experiment data for new target word
-        self.current_experiment_data = []
+        self.current_experiment_data.clear()
         self.experiment_start_time = None
         self.last_direction = None
         self.last_position = self.index  # Set to current position
@@ -172,90 +289,127 @@ class DictionnaireApp:
         self.start_time = None
 
     def prev_word(self):
-        self.update_word_view_time()
-        self.detect_direction_change(-1)  # Moving left
+        now = time.monotonic_ns()
+        self.update_word_view_time(now)
+        self.detect_direction_change(-1, now)  # Moving left
         self.index = max(0, self.index - 1)
-        self.label.config(text=self.mots[self.index])
-        self.scroll.set(self.index)
-        self.current_word_start_time = time.time()
+        self.log_event(EVENT_KEY_LEFT, self.index, now)
+        self.schedule_render()
+        self.current_word_start_time = now
 
     def next_word(self):
-        self.update_word_view_time()
-        self.detect_direction_change(1)  # Moving right
+        now = time.monotonic_ns()
+        self.update_word_view_time(now)
+        self.detect_direction_change(1, now)  # Moving right
         self.index = min(len(self.mots) - 1, self.index + 1)
-        self.label.config(text=self.mots[self.index])
-        self.scroll.set(self.index)
-        self.current_word_start_time = time.time()
+        self.log_event(EVENT_KEY_RIGHT, self.index, now)
+        self.schedule_render()
+        self.current_word_start_time = now
 
-    def scroll_to(self, val):
-        self.update_word_view_time()
+    def scroll_to(self, val, event_type=EVENT_SCALE):
         new_index = int(val)
+        if event_type == EVENT_SCALE and new_index == self.scale_echo:
+            # Tk reports our own scroll.set() once idle, possibly after a key press already moved on: not a move
+            self.scale_echo = None
+            return
+        if new_index == self.index:
+            # Echo of our own scroll.set() or a drag tick that didn't move: no new position to record
+            return
+        now = time.monotonic_ns()
+        self.update_word_view_time(now)
         # Detect direction based on position change
         if self.last_position is not None:
             direction = 1 if new_index > self.last_position else -1 if new_index < self.last_position else 0
             if direction != 0:
-                self.detect_direction_change(direction)
+                self.detect_direction_change(direction, now)
         
         self.index = new_index
-        self.label.config(text=self.mots[self.index])
-        self.current_word_start_time = time.time()
-
-    def detect_direction_change(self, current_direction):
+        self.log_event(event_type, self.index, now)
+        self.schedule_render()
+        self.current_word_start_time = now
+
+    def log_event(self, event_type, index, now):
+        if self.event_log:
+            self.event_log.log(event_type, index, now)
+
+    def schedule_render(self):
+        """Coalesce bursts of key/scale events into one redraw per frame.
+
+        Position crossings are still recorded immediately by the handlers, with their own timestamps;
+        only the widget updates are deferred.
+        """
+        if self.render_job is None:
+            self.render_job = self.root.after(RENDER_INTERVAL_MS, self.render)
+
+    def render(self):
+        self.render_job = None
+        self.show_words()
+        self.set_scale(self.index)
+
+    def set_scale(self, value):
+        if self.scroll.get() != value:  # Tk only calls the scale's command when its value changes
+            self.scale_echo = value
+            self.scroll.set(value)
+
+    def cancel_render(self):
+        if self.render_job is not None:
+            self.root.after_cancel(self.render_job)
+            self.render_job = None
+
+    def detect_direction_change(self, current_direction, now):
         """Detect if the participant changed direction and log the position"""
         if self.experiment_start_time is None:
             return
             
-        current_time = time.time()
         direction_name = "left" if current_direction == -1 else "right"
         
         # Check if direction changed
         if self.last_direction is not None and self.last_direction != direction_name:
             # Direction changed! Log this position even if <1 second
-            target_pos = self.mots.index(self.target_word) if self.target_word in self.mots else -1
-            relative_position = self.index - target_pos
-            time_from_start = round(current_time - self.experiment_start_time, 2)
+            relative_position = self.index - self.target_pos
+            time_from_start = round((now - self.experiment_start_time) / 1e9, 2)
             
             # Add to experiment data (simple [position, time] tuple, no marker)
-            self.current_experiment_data.append([relative_position, time_from_start])
+            self.current_experiment_data.append(relative_position, time_from_start)
             
             # Update last position update time
-            self.last_position_update_time = current_time
+            self.last_position_update_time = now
         
         # Update direction and position tracking
         self.last_direction = direction_name
         self.last_position = self.index
 
-    def update_word_view_time(self):
+    def update_word_view_time(self, now):
         """Update viewing time for current word and log position if viewed for more than 1 second"""
         if self.current_word_start_time is not None and self.experiment_start_time is not None:
-            current_time = time.time()
-            view_duration = current_time - self.current_word_start_time
+            view_duration = now - self.current_word_start_time
             
-            if view_duration >= 1.0:  # Only log if viewed for at least 1 second
+            if view_duration >= DWELL_THRESHOLD_NS:  # Only log if viewed for at least 1 second
                 # Calculate position relative to target word
-                target_pos = self.mots.index(self.target_word) if self.target_word in self.mots else -1
                 current_pos = self.index
-                relative_position = current_pos - target_pos
+                relative_position = current_pos - self.target_pos
                 
                 # Calculate time relative to experiment start
-                time_from_start = round(current_time - self.experiment_start_time, 2)
+                time_from_start = round((now - self.experiment_start_time) / 1e9, 2)
                 
                 # Add to experiment data
-                self.current_experiment_data.append([relative_position, time_from_start])
+                self.current_experiment_data.append(relative_position, time_from_start)
                 
                 # Update last position update time
-                self.last_position_update_time = current_time
+                self.last_position_update_time = now
         
         # Reset for next word
-        self.current_word_start_time = time.time()
+        self.current_word_start_time = now
 
     def start_timer(self):
-        self.start_time = time.time()
-        self.experiment_start_time = time.time()  # Start of experiment for this target word
-        self.current_word_start_time = time.time()  # Start viewing current word
-        self.current_experiment_data = []  # Reset data for new experiment
+        now = time.monotonic_ns()
+        self.start_time = now
+        self.experiment_start_time = now  # Start of experiment for this target word
+        self.current_word_start_time = now  # Start viewing current word
+        self.current_experiment_data.clear()  # Reset data for new experiment
         self.last_direction = None  # Reset direction tracking
         self.last_position = self.index  # Set initial position
+        self.log_event(EVENT_START, self.index, now)
         self.feedback.config(text=f"⏱️ Recherche du mot « {self.target_word} » en cours...", fg="black")
 
     def stop_timer(self):
@@ -264,24 +418,45 @@ class DictionnaireApp:
             return
 
         # Update final word view time
-        self.update_word_view_time()
+        now = time.monotonic_ns()
+        self.update_word_view_time(now)
 
-        elapsed = round(time.time() - self.start_time, 2)
+        elapsed = round((now - self.start_time) / 1e9, 2)
         mot_trouve = self.mots[self.index]
-        erreur = "non" if mot_trouve == self.target_word else "oui"
+        # The target may have been found through an accent- or case-insensitive match, so its position counts too;
+        # the spelling alone still counts for words listed twice in the lexicon
+        found = self.index == self.target_pos or mot_trouve == self.target_word
+        erreur = "non" if found else "oui"
+        error_type, edit_distance = "", 0
+        if erreur == "oui":
+            error_type, edit_distance = classify_wrong_word(mot_trouve, self.index, self.target_word,
+                                                            self.target_pos)
+        self.log_event(EVENT_WRONG if erreur == "oui" else EVENT_FOUND, self.index, now)
+        if self.event_log:
+            self.event_log.flush()  # Hand the trial's events to the writer thread
 
         # Find target word position in dictionary
-        target_word_pos = self.mots.index(self.target_word) if self.target_word in self.mots else -1
+        target_word_pos = self.target_pos
+
+        # Only the pairs logged since the trial's previous attempt are written, from step first_step on
+        first_step, new_pairs = self.current_experiment_data.take_unwritten()
 
         # Write to the participant-specific CSV file
         if self.csv_writer:
-            self.csv_writer.writerow([
+            self.write_trial_row([
                 self.participant_number,
                 self.target_word,
                 target_word_pos,
-                self.current_experiment_data
+                new_pairs,
+                mot_trouve,
+                error_type,
+                edit_distance,
+                first_step
             ])
-            self.csv_file.flush()  # Ensure data is written immediately
+        if self.session_store:
+            self.session_store.add_attempt(self.session_name, self.target_word, target_word_pos, self.attempt_number,
+                                           mot_trouve, erreur == "oui", elapsed, first_step, new_pairs)
+        self.attempt_number += 1
 
         if erreur == "oui":
             self.feedback.config(text=f"⚠️ Mauvais mot : {mot_trouve} (le chrono continue)", fg="orange")
@@ -291,11 +466,29 @@ class DictionnaireApp:
             self.current_target_index += 1
             self.root.after(1000, self.load_next_target)
 
+    def write_trial_row(self, row):
+        self.csv_writer.writerow(row)
+        self.csv_file.flush()  # Ensure data is written immediately
+
     # ----------- End screen ------------
     def show_end_screen(self):
         # Close the CSV file
         if self.csv_file:
             self.csv_file.close()
+            if self.upload_queue:
+                self.upload_queue.submit(self.csv_file.name)
+        if self.event_log:
+            self.event_log.close()
+            if self.upload_queue:
+                self.upload_queue.submit(self.event_log.path)
+            self.event_log = None
+        if self.session_store:
+            self.session_store.end_session(self.session_name)
+        if self.probes and self.csv_file:
+            report_path = self.probes.write_report(os.path.splitext(self.csv_file.name)[0] + ".perf.json",
+                                                   {"participant_number": self.participant_number})
+            if self.upload_queue:
+                self.upload_queue.submit(report_path)
             
         self.clear_window()
         done_label = tk.Label(self.root, text="🎉 Expérience terminée !", font=("Helvetica", 24, "bold"))
@@ -312,17 +505,20 @@ class DictionnaireApp:
 
     # ----------- Utility ------------
     def clear_window(self):
+        self.cancel_render()
         for widget in self.root.winfo_children():
             widget.destroy()
 
 
 if __name__ == "__main__":
-    # Load dictionary words as list from CSV
-    mots = []
-    with open("petit_dictionaire.csv", "r", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        mots = [row[0] for row in reader]
+    # Load dictionary words from the compiled lexicon (compiled from the CSV on first launch)
+    mots = load_lexicon("petit_dictionaire.csv")
 
     root = tk.Tk()
-    app = DictionnaireApp(root, mots)
-    root.mainloop()
\ No newline at end of file
+    app = DictionnaireApp(root, mots, session_db=SESSION_DB, upload_results=UPLOAD_RESULTS,
+                          perf_probes=PERF_PROBES, word_window=WORD_WINDOW, session_server=SESSION_SERVER)
+    root.mainloop()
+    if app.session_store:
+        app.session_store.close()  # Commit whatever is still queued
+    if app.upload_queue:
+        app.upload_queue.close()  # Unsent files stay spooled for the next launch
\ No newline at end of file
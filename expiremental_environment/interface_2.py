@@ -5,11 +5,19 @@ import random
 from difflib import get_close_matches
 import os
 from datetime import datetime
+import sys
+
+# Shared lexicon tools live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lexicon import load_lexicon, position_index
 
 class DictionnaireApp:
     def __init__(self, root, mots):
         self.root = root
         self.mots = mots
+        # Word -> position index, built once so target lookups don't scan the lexicon
+        self.word_positions = position_index(mots)
+        self.target_pos = -1
         self.index = 0
         self.start_time = None
         self.participant_number = None
@@ -128,6 +136,7 @@ class DictionnaireApp:
             return
 
         self.target_word = self.target_words[self.current_target_index]
+        self.target_pos = self.word_positions.get(self.target_word, -1)
         # Reset experiment data for new target word
         self.current_experiment_data = []
         self.experiment_start_time = None
@@ -172,9 +181,8 @@ class DictionnaireApp:
             
             if view_duration >= 1.0:  # Only log if viewed for at least 1 second
                 # Calculate position relative to target word
-                target_pos = self.mots.index(self.target_word) if self.target_word in self.mots else -1
                 current_pos = self.index
-                relative_position = current_pos - target_pos
+                relative_position = current_pos - self.target_pos
                 
                 # Calculate time relative to experiment start
                 time_from_start = round(current_time - self.experiment_start_time, 2)
@@ -205,10 +213,13 @@ class DictionnaireApp:
 
         elapsed = round(time.time() - self.start_time, 2)
         mot_trouve = self.mots[self.index]
-        erreur = "non" if mot_trouve == self.target_word else "oui"
+        # The target may have been found through an accent- or case-insensitive match, so its position counts too;
+        # the spelling alone still counts for words listed twice in the lexicon
+        found = self.index == self.target_pos or mot_trouve == self.target_word
+        erreur = "non" if found else "oui"
 
         # Find target word position in dictionary
-        target_word_pos = self.mots.index(self.target_word) if self.target_word in self.mots else -1
+        target_word_pos = self.target_pos
 
         # Write to the participant-specific CSV file
         if self.csv_writer:
@@ -254,11 +265,8 @@ class DictionnaireApp:
 
 
 if __name__ == "__main__":
-    # Load dictionary words as list from CSV
-    mots = []
-    with open("petit_dictionaire.csv", "r", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        mots = [row[0] for row in reader]
+    # Load dictionary words from the compiled lexicon (compiled from the CSV on first launch)
+    mots = load_lexicon("petit_dictionaire.csv")
 
     root = tk.Tk()
     app = DictionnaireApp(root, mots)
@@ -0,0 +1,96 @@
+# sondes de temps d'exécution dans les gestionnaires d'évènements, pour distinguer une interface figée d'un participant lent
+
+import functools
+import json
+import time
+from array import array
+
+# A call longer than one display frame is reported individually as a stall
+STALL_THRESHOLD_NS = 16_000_000
+
+
+def percentiles(samples):
+    """n, p50/p90/p99 and max of durations in µs"""
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], 1)
+    return {"n": len(ordered), "p50_us": pick(0.5), "p90_us": pick(0.9), "p99_us": pick(0.99),
+            "max_us": round(ordered[-1], 1)}
+
+
+class PerfProbes:
+    """Ring buffer of (probe, start, duration) timings, kept in preallocated arrays.
+
+    Timestamps come from time.monotonic_ns(), like the event log, so a stall can be matched with the events
+    around it. Once the buffer is full the oldest timings are overwritten.
+    """
+
+    def __init__(self, capacity=65536, stall_threshold_ns=STALL_THRESHOLD_NS):
+        self.capacity = capacity
+        self.stall_threshold_ns = stall_threshold_ns
+        self.names = []
+        self.probe_ids = array("H", bytes(2 * capacity))
+        self.starts = array("q", bytes(8 * capacity))
+        self.durations = array("q", bytes(8 * capacity))
+        self.count = 0
+
+    def reset(self):
+        self.count = 0
+
+    def probe_id(self, name):
+        if name not in self.names:
+            self.names.append(name)
+        return self.names.index(name)
+
+    def record(self, probe_id, start_ns, end_ns):
+        slot = self.count % self.capacity
+        self.probe_ids[slot] = probe_id
+        self.starts[slot] = start_ns
+        self.durations[slot] = end_ns - start_ns
+        self.count += 1
+
+    def wrap(self, name, func):
+        """Return func timed under `name`"""
+        probe_id = self.probe_id(name)
+        record = self.record
+        clock = time.monotonic_ns
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(probe_id, start, clock())
+        return timed
+
+    def instrument(self, obj, method_names):
+        """Replace the given methods of obj by timed versions (instance attributes, the class is untouched)"""
+        for name in method_names:
+            setattr(obj, name, self.wrap(name, getattr(obj, name)))
+
+    def report(self):
+        kept = min(self.count, self.capacity)
+        by_probe = {}
+        stalls = []
+        for slot in range(kept):
+            name = self.names[self.probe_ids[slot]]
+            duration = self.durations[slot]
+            by_probe.setdefault(name, []).append(duration / 1e3)
+            if duration >= self.stall_threshold_ns:
+                stalls.append({"probe": name, "t_ns": self.starts[slot], "duration_us": round(duration / 1e3, 1)})
+        stalls.sort(key=lambda stall: stall["t_ns"])
+        return {
+            "recorded": self.count,
+            "dropped": self.count - kept,
+            "stall_threshold_us": self.stall_threshold_ns / 1e3,
+            "probes": {name: percentiles(values) for name, values in sorted(by_probe.items())},
+            "stalls": stalls,
+        }
+
+    def write_report(self, path, metadata=None):
+        report = dict(metadata or {}, **self.report())
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        return path
@@ -0,0 +1,286 @@
+# rejoue des flux d'évènements (synthétiques ou enregistrés) dans DictionnaireApp sans écran, et mesure la latence
+
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tkinter.font
+import types
+
+from event_log import (read_event_log, EVENT_START, EVENT_KEY_LEFT, EVENT_KEY_RIGHT, EVENT_SCALE, EVENT_CLICK,
+                       EVENT_FOUND, EVENT_WRONG)
+from perf_probes import percentiles
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lexicon import load_lexicon
+
+VARIANTS = ["interface", "interface_2"]
+LEXICONS = ["petit_dictionaire.csv", "final_cleaned_dictionary.csv"]
+
+
+class VirtualClock:
+    """Stands in for the `time` module of the interface, so event timing doesn't depend on how fast we replay"""
+
+    def __init__(self):
+        self.now_ns = 0
+        self.epoch = time.time()
+
+    def time(self):
+        return self.epoch + self.now_ns / 1e9
+
+    def monotonic_ns(self):
+        return self.now_ns
+
+    def sleep(self, seconds):
+        self.now_ns += int(seconds * 1e9)
+
+
+class HeadlessWidget:
+    """Accepts the Tk calls DictionnaireApp makes; a Scale calls its command when its value changes, as in Tk"""
+
+    def __init__(self, master=None, **options):
+        self.root = master.root if master is not None else None
+        self.options = options
+        self.value = options.get("from_", 0)
+        if self.root is not None:
+            self.root.children.append(self)
+
+    def config(self, **options):
+        self.options.update(options)
+
+    configure = config
+
+    def __getitem__(self, name):
+        return self.options["from_" if name == "from" else name]
+
+    def set(self, value):
+        if int(value) != self.value:
+            self.value = int(value)
+            if "command" in self.options:
+                self.root.after(0, self.options["command"], str(self.value))
+
+    def get(self):
+        return self.value
+
+    def winfo_width(self):
+        return self.options.get("length", 500)
+
+    def winfo_exists(self):
+        return True
+
+    def pack(self, **options):
+        pass
+
+    def bind(self, sequence, handler):
+        pass
+
+    def destroy(self):
+        if self in self.root.children:
+            self.root.children.remove(self)
+
+
+class HeadlessEntry(HeadlessWidget):
+    def get(self):
+        return "0"  # Participant number
+
+
+class HeadlessRoot:
+    def __init__(self, clock):
+        self.root = self
+        self.clock = clock
+        self.children = []
+        self.jobs = {}
+        self.next_job = 0
+
+    def after(self, ms, func, *args):
+        self.next_job += 1
+        self.jobs[self.next_job] = (self.clock.now_ns + int(ms * 1e6), func, args)
+        return self.next_job
+
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+
+    def due_jobs(self):
+        """Pop the callbacks whose time has come, in the order Tk would run them"""
+        due = sorted((when, job) for job, (when, _, _) in self.jobs.items() if when <= self.clock.now_ns)
+        return [self.jobs.pop(job)[1:] for _, job in due]
+
+    def winfo_children(self):
+        return list(self.children)
+
+    def title(self, text):
+        pass
+
+    def geometry(self, spec):
+        pass
+
+    def bind(self, sequence, handler):
+        pass
+
+
+class _Font:
+    def __init__(self, **options):
+        self.size = options.get("size", 12)
+
+    def measure(self, text):
+        return len(text) * self.size * 6 // 10
+
+
+@contextlib.contextmanager
+def headless(module, clock):
+    """Point the interface module at the virtual clock and headless widgets for the duration of a run"""
+    fake_tk = types.SimpleNamespace(Label=HeadlessWidget, Button=HeadlessWidget, Frame=HeadlessWidget,
+                                    Scale=HeadlessWidget, Entry=HeadlessEntry, LEFT="left", HORIZONTAL="horizontal")
+    saved = module.tk, module.time, tkinter.font.Font
+    module.tk, module.time, tkinter.font.Font = fake_tk, clock, _Font
+    try:
+        yield
+    finally:
+        module.tk, module.time, tkinter.font.Font = saved
+
+
+def synthetic_session(app, rng):
+    """Yield (delay_ms, action, value) like a participant: scale drags toward the target, then arrow keys"""
+    n_words = len(app.mots)
+    for _ in range(len(app.target_words)):
+        yield 1100, "start", None  # load_next_target runs 1 s after the previous word was found
+        target = app.target_pos
+        # A few scale drags, each a burst of ticks at 60 Hz, landing nearer the target every time
+        for spread in (0.3, 0.05, 0.01):
+            goal = min(max(target + int(rng.gauss(0, spread * n_words)), 0), n_words - 1)
+            start = app.index
+            ticks = rng.randint(10, 40)
+            for tick in range(1, ticks + 1):
+                yield 16, "scale", start + (goal - start) * tick // ticks
+            yield rng.randint(400, 1500), "pause", None
+        if rng.random() < 0.3:
+            yield 300, "click", min(max(target + rng.randint(-20, 20), 0), n_words - 1)
+        # Arrow keys at typing speed until on the target, with an occasional wrong "Trouvé"
+        while app.index != target:
+            if rng.random() < 0.02:
+                yield 200, "found", None
+            yield rng.randint(80, 250), "left" if app.index > target else "right", None
+        yield 500, "found", None
+
+
+def recorded_session(path):
+    """Turn a .events file back into an action stream with the original inter-event delays"""
+    _, events = read_event_log(path)
+    actions = {EVENT_START: "start", EVENT_KEY_LEFT: "left", EVENT_KEY_RIGHT: "right", EVENT_SCALE: "scale",
+               EVENT_CLICK: "click", EVENT_FOUND: "found", EVENT_WRONG: "found"}
+
+    def stream(app, rng):
+        previous = None
+        for t_ns, index, event_type in events:
+            if event_type in actions:
+                delay = 0 if previous is None else (t_ns - previous) / 1e6
+                yield delay, actions[event_type], index
+            previous = t_ns
+    return stream
+
+
+def dispatch(app, action, value):
+    if action == "start":
+        app.start_timer()
+    elif action == "left":
+        app.prev_word()
+    elif action == "right":
+        app.next_word()
+    elif action == "scale":
+        app.scroll.set(value)  # Tk calls scroll_to from the scale, like a drag
+    elif action == "click":
+        scale = app.scroll
+        x = (value - int(scale["from"])) / max(int(scale["to"]) - int(scale["from"]), 1) * scale.winfo_width()
+        app.jump_to_click(types.SimpleNamespace(widget=scale, x=x))
+    elif action == "found":
+        app.stop_timer()
+
+
+def replay(variant, mots, stream, seed=0):
+    """Run one session of `variant` through `stream`; return handler latencies in µs, keyed by handler"""
+    module = importlib.import_module(variant)
+    clock = VirtualClock()
+    latencies = {}
+
+    def timed(name, func, *args):
+        start = time.perf_counter_ns()
+        func(*args)
+        latencies.setdefault(name, []).append((time.perf_counter_ns() - start) / 1e3)
+
+    def run_due(root):
+        for func, args in root.due_jobs():
+            timed(getattr(func, "__name__", "callback"), func, *args)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="replay_") as tmp_dir, headless(module, clock):
+        os.chdir(tmp_dir)  # Session files land in the temporary directory
+        try:
+            root = HeadlessRoot(clock)
+            app = module.DictionnaireApp(root, mots)
+            app.start_experiment()
+            rng = random.Random(seed)
+            if any(word not in app.word_positions for word in app.target_words):
+                # The hardcoded targets only exist in petit_dictionaire.csv: search for words of this lexicon instead
+                app.target_words = rng.sample(mots, len(app.target_words))
+                app.load_next_target()
+            for delay_ms, action, value in stream(app, rng):
+                # Let Tk callbacks (redraws, scale echoes, next target) run as virtual time passes
+                target_ns = clock.now_ns + int(delay_ms * 1e6)
+                while True:
+                    pending = [when for when, _, _ in root.jobs.values() if when <= target_ns]
+                    if not pending:
+                        break
+                    clock.now_ns = max(clock.now_ns, min(pending))
+                    run_due(root)
+                clock.now_ns = target_ns
+                if action != "pause":
+                    timed(action, dispatch, app, action, value)
+                run_due(root)
+            clock.sleep(2)
+            run_due(root)
+        finally:
+            os.chdir(cwd)
+    return latencies
+
+
+def benchmark(variants=VARIANTS, lexicons=LEXICONS, sessions=3, stream=synthetic_session):
+    report = {}
+    for lexicon_path in lexicons:
+        mots = load_lexicon(lexicon_path)
+        for variant in variants:
+            merged = {}
+            for seed in range(sessions):
+                for name, values in replay(variant, mots, stream, seed).items():
+                    merged.setdefault(name, []).extend(values)
+            report.setdefault(variant, {})[os.path.basename(lexicon_path)] = {
+                name: percentiles(values) for name, values in sorted(merged.items())}
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay event streams through DictionnaireApp without a display")
+    parser.add_argument("--variant", action="append", choices=VARIANTS, help="default: both interfaces")
+    parser.add_argument("--lexicon", action="append", help="default: petit_dictionaire.csv and "
+                                                           "final_cleaned_dictionary.csv")
+    parser.add_argument("--events", help="replay a recorded .events session instead of synthetic participants")
+    parser.add_argument("--sessions", type=int, default=3, help="synthetic sessions per variant and lexicon")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    stream = recorded_session(args.events) if args.events else synthetic_session
+    report = benchmark(args.variant or VARIANTS, args.lexicon or LEXICONS,
+                       1 if args.events else args.sessions, stream)
+    for variant, by_lexicon in report.items():
+        for lexicon_name, by_handler in by_lexicon.items():
+            print(f"{variant} / {lexicon_name}")
+            for name, stats in by_handler.items():
+                print(f"  {name:<18} n={stats['n']:<6} p50={stats['p50_us']}µs p90={stats['p90_us']}µs "
+                      f"p99={stats['p99_us']}µs max={stats['max_us']}µs")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
@@ -0,0 +1,345 @@
+# serveur local qui reçoit les essais de tous les postes et les enregistre dans une seule base
+
+import argparse
+import asyncio
+import contextlib
+import html
+import json
+import os
+import queue
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from session_store import ITEM_KINDS, WRITE_RETRIES, connect, session_progress, write_items
+
+DEFAULT_PORT = 8765
+DEFAULT_HTTP_PORT = 8766
+PROGRESS_COLUMNS = ["session", "participant", "booth", "started_at", "finished", "attempts", "found"]
+
+
+class SessionServer:
+    """Collects the session rows of every booth into one SQLite database.
+
+    Booths send newline-delimited JSON batches {"batch": n, "items": [...]} whose items are the tuples SessionStore
+    queues; each batch is acknowledged with {"ack": n, "rejected": [[index, error], ...]} once committed, so a booth
+    re-sends anything unacknowledged and drops the items the database refused.
+    Batches arriving together from different booths are committed in one transaction by a single writer thread.
+    Re-sent trials are ignored: a session is identified by its name (participant and timestamp) and an attempt by
+    (session, target, attempt number). {"progress": true} returns the live progress table.
+    """
+
+    def __init__(self, db_path, host="127.0.0.1", port=DEFAULT_PORT, http_port=None):
+        self.db_path = db_path
+        self.host = host
+        self.port = port
+        self.http_port = http_port
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-server-writer")
+        self.conn = None
+        self.commits = None
+        self.servers = []
+        self.connections = {}  # Booth stream writer -> the task handling it
+        self.commit_task = None
+        self.batches = 0
+        self.items = 0
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        # The connection is created and only ever used on the writer thread
+        self.conn = await loop.run_in_executor(self.executor, connect, self.db_path)
+        self.commits = asyncio.Queue()
+        self.commit_task = asyncio.create_task(self._commit_loop())
+        booth_server = await asyncio.start_server(self._handle_booth, self.host, self.port)
+        self.port = booth_server.sockets[0].getsockname()[1]  # Resolved when started on port 0
+        self.servers.append(booth_server)
+        if self.http_port is not None:
+            http_server = await asyncio.start_server(self._handle_http, self.host, self.http_port)
+            self.http_port = http_server.sockets[0].getsockname()[1]
+            self.servers.append(http_server)
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+        # Booth handlers still waiting on a commit finish before the commit loop stops
+        for writer in list(self.connections):
+            writer.close()
+        await asyncio.gather(*self.connections.values(), return_exceptions=True)
+        for server in self.servers:
+            await server.wait_closed()
+        self.commit_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self.commit_task
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.conn.close)
+        self.executor.shutdown()
+
+    async def progress(self):
+        rows = await asyncio.get_running_loop().run_in_executor(self.executor, session_progress, self.conn)
+        return [dict(zip(PROGRESS_COLUMNS, row)) for row in rows]
+
+    async def _commit_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.commits.get()]
+            while not self.commits.empty():
+                pending.append(self.commits.get_nowait())
+            items = [item for batch_items, _ in pending for item in batch_items]
+            try:
+                await loop.run_in_executor(self.executor, write_items, self.conn, items)
+            except Exception:
+                # e.g. a malformed row: commit each booth's batch on its own, and a refused batch item by item,
+                # so only the faulty items are rejected
+                for batch_items, done in pending:
+                    try:
+                        await loop.run_in_executor(self.executor, write_items, self.conn, batch_items)
+                    except Exception:
+                        self._acknowledge(batch_items, done, await self._write_each(batch_items))
+                    else:
+                        self._acknowledge(batch_items, done)
+                continue
+            for batch_items, done in pending:
+                self._acknowledge(batch_items, done)
+
+    async def _write_each(self, items):
+        rejected = []
+        for index, item in enumerate(items):
+            try:
+                await asyncio.get_running_loop().run_in_executor(self.executor, write_items, self.conn, [item])
+            except Exception as e:
+                print(f"Rejected one {item[0]} row ({e!r})", file=sys.stderr)
+                rejected.append([index, repr(e)])
+        return rejected
+
+    def _acknowledge(self, items, done, rejected=()):
+        self.batches += 1
+        self.items += len(items) - len(rejected)
+        done.set_result(list(rejected))
+
+    async def _handle_booth(self, reader, writer):
+        self.connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if request.get("progress"):
+                        reply = {"progress": await self.progress()}
+                    else:
+                        items = [tuple(item) for item in request["items"]]
+                        if any(not item or item[0] not in ITEM_KINDS for item in items):
+                            raise ValueError("unknown item kind")
+                        done = asyncio.get_running_loop().create_future()
+                        await self.commits.put((items, done))
+                        reply = {"ack": request.get("batch"), "rejected": await done}
+                except Exception as e:
+                    reply = {"error": repr(e)}
+                writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.connections[writer]
+            writer.close()
+
+    async def _handle_http(self, reader, writer):
+        """Plain HTML progress page that reloads itself every two seconds"""
+        try:
+            while (await reader.readline()).strip():
+                pass  # Request line and headers, whatever the path
+            rows = "".join("<tr>" + "".join(f"<td>{html.escape(str(row[column]))}</td>" for column in PROGRESS_COLUMNS)
+                           + "</tr>" for row in await self.progress())
+            body = (f"<html><head><meta charset='utf-8'><meta http-equiv='refresh' content='2'></head><body>"
+                    f"<p>{self.items} rows in {self.batches} batches</p><table border='1'><tr>"
+                    + "".join(f"<th>{column}</th>" for column in PROGRESS_COLUMNS) + f"</tr>{rows}</table></body></html>")
+            payload = body.encode("utf-8")
+            writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n"
+                         + f"Content-Length: {len(payload)}\r\n\r\n".encode("ascii") + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+class SessionClient:
+    """Streams a booth's session rows to a SessionServer; same calls as SessionStore, so DictionnaireApp can use either.
+
+    Calls only queue the rows; a background thread sends everything queued so far as one batch and keeps it until
+    the server acknowledges it, reconnecting every retry_delay seconds while the server is unreachable.
+    """
+
+    def __init__(self, address, booth=None, retry_delay=2.0, timeout=10.0):
+        self.address = address
+        self.booth = booth or socket.gethostname()
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.queue = queue.SimpleQueue()
+        self.writer = threading.Thread(target=self._send_loop, name="session-client", daemon=True)
+        self.writer.start()
+
+    def start_session(self, name, participant_number, started_at):
+        self.queue.put(("session", name, participant_number, self.booth, started_at))
+
+    def add_attempt(self, session_name, target_word, target_pos, attempt, word_found, error, elapsed, first_step,
+                    new_pairs):
+        self.queue.put(("attempt", session_name, target_word, target_pos, attempt, word_found, error, elapsed,
+                        first_step, [list(pair) for pair in new_pairs], time.time()))
+
+    def end_session(self, name):
+        self.queue.put(("end", name))
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+
+    def _send_loop(self):
+        pending = []
+        stopping = False
+        failures = 0
+        batch_number = 0
+        connection = None
+        while True:
+            if not pending and not stopping:
+                pending.append(self.queue.get())
+            while True:
+                try:
+                    pending.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in pending:
+                stopping = True
+                pending = [item for item in pending if item is not None]
+            if not pending:
+                break
+            try:
+                if connection is None:
+                    connection = socket.create_connection(self.address, timeout=self.timeout)
+                    replies = connection.makefile("rb")
+                batch_number += 1
+                connection.sendall(json.dumps({"batch": batch_number, "items": pending}).encode("utf-8") + b"\n")
+                reply = json.loads(replies.readline() or b"{}")
+                if reply.get("ack") != batch_number:
+                    raise ConnectionError(reply.get("error", "no acknowledgement"))
+                for index, error in reply.get("rejected", []):
+                    print(f"Dropped one {pending[index][0]} row refused by {self.address} ({error})", file=sys.stderr)
+                pending = []
+                failures = 0
+            except (OSError, ValueError) as e:
+                if connection is not None:
+                    connection.close()
+                    connection = None
+                failures += 1
+                print(f"Session server {self.address} unreachable ({e!r}), {len(pending)} rows kept", file=sys.stderr)
+                if stopping and failures > WRITE_RETRIES:
+                    print(f"Dropped {len(pending)} rows that could not be sent to {self.address}", file=sys.stderr)
+                    break
+                time.sleep(self.retry_delay)
+        if connection is not None:
+            connection.close()
+
+
+def request_progress(address, timeout=10.0):
+    with socket.create_connection(address, timeout=timeout) as connection:
+        connection.sendall(b'{"progress": true}\n')
+        return json.loads(connection.makefile("rb").readline())["progress"]
+
+
+async def load_test(n_booths=40, sessions_per_booth=5, targets=5, wrong_rate=0.3):
+    """Run a server and n_booths SessionClients on this machine, re-sending every session once; returns the counts.
+
+    Every attempt is sent twice, so the stored counts only match the expected ones if duplicates are ignored.
+    """
+    with tempfile.TemporaryDirectory(prefix="session_server_") as tmp_dir:
+        server = SessionServer(os.path.join(tmp_dir, "sessions.db"), port=0)
+        await server.start()
+        expected_attempts = 0
+        sent_lock = threading.Lock()
+
+        def booth(number):
+            nonlocal expected_attempts
+            client = SessionClient(("127.0.0.1", server.port), booth=f"booth{number}", retry_delay=0.1)
+            rng = random.Random(number)
+            attempts = 0
+            for session in range(sessions_per_booth):
+                name = f"p{number * 1000 + session}_at_20250101_{session:06d}"
+                rows = [("start", name, number * 1000 + session, "20250101")]
+                for target in range(targets):
+                    n_attempts = 1
+                    while rng.random() < wrong_rate:
+                        n_attempts += 1
+                    for attempt in range(n_attempts):  # 20 new samples per attempt
+                        rows.append(("attempt", name, f"target{target}", target * 100, attempt, f"word{attempt}",
+                                     attempt < n_attempts - 1, 1.0 + attempt, 20 * attempt,
+                                     [[rng.randint(-500, 500), float(step)] for step in range(20 * attempt,
+                                                                                           20 * attempt + 20)]))
+                    attempts += n_attempts
+                rows.append(("end", name))
+                for _ in range(2):  # Re-sent, as after a lost acknowledgement
+                    for kind, *args in rows:
+                        getattr(client, {"start": "start_session", "attempt": "add_attempt",
+                                         "end": "end_session"}[kind])(*args)
+            client.close()
+            with sent_lock:
+                expected_attempts += attempts
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=n_booths) as booths:
+            await asyncio.gather(*(loop.run_in_executor(booths, booth, number) for number in range(n_booths)))
+        elapsed = time.perf_counter() - start
+        progress = await server.progress()
+        report = {
+            "booths": n_booths,
+            "sessions": len(progress),
+            "expected_sessions": n_booths * sessions_per_booth,
+            "attempts": sum(row["attempts"] for row in progress),
+            "expected_attempts": expected_attempts,
+            "finished": sum(row["finished"] for row in progress),
+            "rows_received": server.items,
+            "batches": server.batches,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(server.items / elapsed),
+        }
+        await server.close()
+        return report
+
+
+async def serve(db_path, host, port, http_port):
+    server = SessionServer(db_path, host, port, http_port)
+    await server.start()
+    print(f"Receiving sessions on {host}:{server.port} into {db_path}"
+          + (f", progress at http://{host}:{server.http_port}/" if http_port is not None else ""))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect the sessions of every booth into one SQLite database")
+    parser.add_argument("--db", default=os.path.join("results", "sessions.db"))
+    parser.add_argument("--host", default="127.0.0.1", help="0.0.0.0 to accept booths from the LAN")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--http-port", type=int, default=DEFAULT_HTTP_PORT, help="progress page (-1 to disable)")
+    parser.add_argument("--watch", metavar="HOST:PORT", help="print the progress of a running server instead")
+    parser.add_argument("--load-test", type=int, metavar="BOOTHS", help="run a server and simulated booths locally")
+    args = parser.parse_args()
+
+    if args.load_test:
+        print(json.dumps(asyncio.run(load_test(args.load_test)), indent=1))
+    elif args.watch:
+        host, port = args.watch.rsplit(":", 1)
+        while True:
+            rows = request_progress((host, int(port)))
+            print(f"{time.strftime('%H:%M:%S')}  {len(rows)} sessions, {sum(r['finished'] for r in rows)} finished")
+            for row in rows:
+                print("  " + ", ".join(str(row[column]) for column in PROGRESS_COLUMNS))
+            time.sleep(2)
+    else:
+        os.makedirs(os.path.dirname(args.db) or ".", exist_ok=True)
+        asyncio.run(serve(args.db, args.host, args.port, None if args.http_port < 0 else args.http_port))
@@ -0,0 +1,202 @@
+# stockage optionnel des sessions dans une base SQLite (mode WAL), partagée par plusieurs postes
+
+import json
+import queue
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS participants (
+    participant_number INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS targets (
+    id INTEGER PRIMARY KEY,
+    word TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    UNIQUE (word, position)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    participant_number INTEGER NOT NULL REFERENCES participants(participant_number),
+    booth TEXT,
+    started_at TEXT NOT NULL,
+    finished INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    target_id INTEGER NOT NULL REFERENCES targets(id),
+    attempt INTEGER NOT NULL,
+    word_found TEXT NOT NULL,
+    error INTEGER NOT NULL,
+    elapsed REAL NOT NULL,
+    first_step INTEGER NOT NULL,
+    new_position_time_pairs TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    UNIQUE (session_id, target_id, attempt)
+);
+-- Each step of a trial is stored once, under the attempt that logged it; step counts from the trial's start
+CREATE TABLE IF NOT EXISTS steps (
+    attempt_id INTEGER NOT NULL REFERENCES attempts(id),
+    step INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    time REAL NOT NULL,
+    PRIMARY KEY (attempt_id, step)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sessions_participant ON sessions(participant_number);
+CREATE INDEX IF NOT EXISTS attempts_session ON attempts(session_id);
+CREATE INDEX IF NOT EXISTS attempts_target ON attempts(target_id);
+"""
+
+WRITE_RETRIES = 5
+ITEM_KINDS = ("session", "attempt", "end")
+
+
+def connect(path):
+    """Open the session database in WAL mode so booths can write while analyses read"""
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # Committed trials survive an app crash; WAL keeps the file consistent
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class SessionStore:
+    """Batched SQLite writer for one booth.
+
+    Calls only queue the rows; a background thread commits everything queued so far in one transaction,
+    so the Tk thread never waits on the disk or on another booth holding the write lock.
+    """
+
+    def __init__(self, path, booth=None):
+        self.path = path
+        self.booth = booth or socket.gethostname()
+        self.queue = queue.SimpleQueue()
+        connect(path).close()  # Create the schema before the first write
+        self.writer = threading.Thread(target=self._write_loop, name="session-store-writer", daemon=True)
+        self.writer.start()
+
+    def start_session(self, name, participant_number, started_at):
+        self.queue.put(("session", name, participant_number, self.booth, started_at))
+
+    def add_attempt(self, session_name, target_word, target_pos, attempt, word_found, error, elapsed, first_step,
+                    new_pairs):
+        self.queue.put(("attempt", session_name, target_word, target_pos, attempt, word_found, error, elapsed,
+                        first_step, [list(pair) for pair in new_pairs], time.time()))
+
+    def end_session(self, name):
+        self.queue.put(("end", name))
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+
+    def _write_loop(self):
+        conn = connect(self.path)
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            running = None not in batch
+            self._commit(conn, [item for item in batch if item is not None])
+        conn.close()
+
+    def _commit(self, conn, batch):
+        for retry in range(WRITE_RETRIES):
+            try:
+                write_items(conn, batch)
+                return
+            except sqlite3.OperationalError as e:  # Database locked by another booth for longer than the timeout
+                print(f"SQLite write failed ({e}), retry {retry + 1}/{WRITE_RETRIES}", file=sys.stderr)
+                if retry + 1 < WRITE_RETRIES:
+                    time.sleep(2 ** retry)
+            except sqlite3.Error as e:
+                # A row the database rejects must not take the rest of the batch, or the writer thread, with it
+                print(f"SQLite write failed ({e}), writing the batch row by row", file=sys.stderr)
+                self._commit_each(conn, batch)
+                return
+        print(f"Dropped {len(batch)} rows that could not be written to {self.path}", file=sys.stderr)
+
+    def _commit_each(self, conn, batch):
+        for item in batch:
+            try:
+                write_items(conn, [item])
+            except sqlite3.Error as e:
+                print(f"Dropped one {item[0]} row that could not be written to {self.path} ({e})", file=sys.stderr)
+
+    @staticmethod
+    def _write_session(conn, name, participant_number, booth, started_at):
+        conn.execute("INSERT OR IGNORE INTO participants (participant_number) VALUES (?)", (participant_number,))
+        conn.execute("INSERT OR IGNORE INTO sessions (name, participant_number, booth, started_at) VALUES (?, ?, ?, ?)",
+                     (name, participant_number, booth, started_at))
+
+    @staticmethod
+    def _write_attempt(conn, session_name, target_word, target_pos, attempt, word_found, error, elapsed, first_step,
+                       new_pairs, recorded_at):
+        conn.execute("INSERT OR IGNORE INTO targets (word, position) VALUES (?, ?)", (target_word, target_pos))
+        session = conn.execute("SELECT id FROM sessions WHERE name = ?", (session_name,)).fetchone()
+        if session is None:
+            raise sqlite3.IntegrityError(f"attempt for unknown session {session_name!r}")
+        (session_id,) = session
+        (target_id,) = conn.execute("SELECT id FROM targets WHERE word = ? AND position = ?",
+                                    (target_word, target_pos)).fetchone()
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO attempts (session_id, target_id, attempt, word_found, error, elapsed, first_step, "
+            "new_position_time_pairs, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (session_id, target_id, attempt, word_found, int(error), elapsed, first_step, json.dumps(new_pairs),
+             recorded_at))
+        if cursor.rowcount == 0:
+            return  # Attempt already stored
+        conn.executemany("INSERT INTO steps (attempt_id, step, position, time) VALUES (?, ?, ?, ?)",
+                         [(cursor.lastrowid, step, position, t)
+                          for step, (position, t) in enumerate(new_pairs, start=first_step)])
+
+    @staticmethod
+    def _write_end(conn, name):
+        conn.execute("UPDATE sessions SET finished = 1 WHERE name = ?", (name,))
+
+
+def write_items(conn, items):
+    """Write queued ("session" | "attempt" | "end", ...) items in one transaction; re-sent rows are ignored"""
+    with conn:
+        for item in items:
+            getattr(SessionStore, "_write_" + item[0])(conn, *item[1:])
+
+
+def session_progress(conn):
+    """Per session: name, participant, booth, start, finished, attempts and targets found so far"""
+    return conn.execute("""
+        SELECT s.name, s.participant_number, s.booth, s.started_at, s.finished,
+               COUNT(a.id), COALESCE(SUM(a.error = 0), 0)
+        FROM sessions s LEFT JOIN attempts a ON a.session_id = s.id
+        GROUP BY s.id ORDER BY s.id
+    """).fetchall()
+
+
+def target_summary(conn):
+    """Per target: sessions, attempts, wrong attempts and mean time to the correct word"""
+    return conn.execute("""
+        SELECT t.word, t.position,
+               COUNT(DISTINCT a.session_id), COUNT(*), SUM(a.error),
+               AVG(CASE WHEN a.error = 0 THEN a.elapsed END)
+        FROM attempts a JOIN targets t ON t.id = a.target_id
+        GROUP BY t.id ORDER BY t.position
+    """).fetchall()
+
+
+if __name__ == "__main__":
+    # Quick look at a session database, e.g. python session_store.py results/sessions.db
+    conn = connect(sys.argv[1] if len(sys.argv) > 1 else "results/sessions.db")
+    print("target, position, sessions, attempts, wrong, mean time (s)")
+    for row in target_summary(conn):
+        print(", ".join("" if value is None else str(value) for value in row))
+    conn.close()
@@ -0,0 +1,37 @@
+# échantillons [position, temps] de l'essai en cours, stockés dans des tableaux typés
+
+from array import array
+
+
+class TrajectoryBuffer:
+    """Append-only [relative position, time] samples of the current trial.
+
+    Positions are kept as int32 and times as float64. take_unwritten() hands out only the samples added since
+    its previous call, so each sample is written to the results CSV once however many attempts the trial has.
+    """
+
+    def __init__(self):
+        self.positions = array("i")
+        self.times = array("d")
+        self.written = 0
+
+    def append(self, position, t):
+        self.positions.append(position)
+        self.times.append(t)
+
+    def clear(self):
+        del self.positions[:]
+        del self.times[:]
+        self.written = 0
+
+    def __len__(self):
+        return len(self.positions)
+
+    def pairs(self, start=0):
+        return [[position, t] for position, t in zip(self.positions[start:], self.times[start:])]
+
+    def take_unwritten(self):
+        """(index of the first new sample, new samples as [position, time] pairs)"""
+        first = self.written
+        self.written = len(self.positions)
+        return first, self.pairs(first)
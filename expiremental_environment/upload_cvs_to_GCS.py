@@ -1,18 +1,158 @@
-from google.cloud import storage
+import gzip
+import json
 import os
+import random
+import shutil
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+# Shared file hashing lives at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from file_hash import file_sha256
+
+__all__ = ["upload_csvs_to_gcs", "GCSStorage", "LocalStorage"]
 
 # Replace with your bucket name
+BUCKET_NAME = "semantic-search-475516-experiment-data"
+MANIFEST_NAME = ".upload_manifest.json"  # Content hashes of files already uploaded, kept in the local directory
+
+
+class GCSStorage:
+    """Uploads to a Google Cloud Storage bucket (google-cloud-storage is imported only when this is used)"""
+
+    def __init__(self, bucket_name=BUCKET_NAME):
+        from google.cloud import storage
+        self.name = f"gs://{bucket_name}"
+        self.bucket = storage.Client().bucket(bucket_name)
+
+    def upload(self, local_path, remote_name):
+        blob = self.bucket.blob(remote_name)
+        blob.upload_from_filename(local_path)
+
+
+class LocalStorage:
+    """Stand-in bucket backed by a local directory, for dry runs and tests"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.name = f"file://{self.root}"
+
+    def upload(self, local_path, remote_name):
+        destination = os.path.join(self.root, *remote_name.split("/"))
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        tmp_path = destination + ".part"
+        shutil.copyfile(local_path, tmp_path)
+        os.replace(tmp_path, destination)
+
+
+def load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(path, manifest):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def upload_with_retries(storage, local_path, remote_name, retries=4, backoff=1.0):
+    for attempt in range(retries + 1):
+        try:
+            storage.upload(local_path, remote_name)
+            return
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt * (0.5 + random.random()))  # Exponential backoff with jitter
+
+
+def upload_csvs_to_gcs(local_directory, storage=None, prefix="raw", workers=8, retries=4, compress=False,
+                       pack=False, manifest_path=None):
+    """Upload new or changed CSVs from `local_directory`, skipping files whose content hash is in the manifest.
+
+    compress uploads each file as <name>.csv.gz; pack ships all changed files as one .tar.gz archive instead. Packed
+    files are recorded under their archive, so a later sync without pack still uploads them one by one.
+    A failed file is retried with backoff and reported, without stopping the others. Returns
+    {"uploaded": [...], "skipped": [...], "failed": {filename: error}}.
+    """
+    storage = storage or GCSStorage()
+    manifest_path = manifest_path or os.path.join(local_directory, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    uploaded_hashes = manifest.setdefault(storage.name, {})
+    packed_archives = manifest.setdefault("packed", {}).setdefault(storage.name, {})  # {archive: {filename: hash}}
+
+    filenames = sorted(filename for filename in os.listdir(local_directory) if filename.endswith(".csv"))
+    hashes = {filename: file_sha256(os.path.join(local_directory, filename)) for filename in filenames}
+    shipped = set(uploaded_hashes.items())
+    if pack:  # Files already sent inside an earlier archive need not be packed again
+        shipped.update(pair for members in packed_archives.values() for pair in members.items())
+    pending = [filename for filename in filenames if (filename, hashes[filename]) not in shipped]
+    report = {"uploaded": [], "skipped": [f for f in filenames if f not in pending], "failed": {}}
+    if not pending:
+        return report
+
+    lock = threading.Lock()
+
+    def mark_uploaded(names, archive=None):
+        with lock:
+            for name in names:
+                if archive is None:
+                    uploaded_hashes[name] = hashes[name]
+                else:
+                    packed_archives.setdefault(archive, {})[name] = hashes[name]
+                report["uploaded"].append(name)
+            save_manifest(manifest_path, manifest)  # Saved after every upload so an interrupted run resumes
+
+    with tempfile.TemporaryDirectory(prefix="upload_") as tmp_dir:
+        if pack:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            archive = os.path.join(tmp_dir, f"batch_{timestamp}.tar.gz")
+            with tarfile.open(archive, "w:gz") as tar:
+                for filename in pending:
+                    tar.add(os.path.join(local_directory, filename), arcname=filename)
+            try:
+                upload_with_retries(storage, archive, f"{prefix}/{os.path.basename(archive)}", retries)
+                mark_uploaded(pending, os.path.basename(archive))
+                print(f"Uploaded {len(pending)} files as {os.path.basename(archive)} to {storage.name}.")
+            except Exception as e:
+                report["failed"] = {filename: repr(e) for filename in pending}
+            return report
 
+        def upload_one(filename):
+            local_path = os.path.join(local_directory, filename)
+            remote_name = f"{prefix}/{filename}"
+            if compress:
+                gz_path = os.path.join(tmp_dir, filename + ".gz")
+                with open(local_path, "rb") as src, gzip.open(gz_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                local_path, remote_name = gz_path, remote_name + ".gz"
+            upload_with_retries(storage, local_path, remote_name, retries)
+            return filename
 
-def upload_csvs_to_gcs(local_directory):
-    bucket_name = "semantic-search-475516-experiment-data"
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(bucket_name)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(upload_one, filename): filename for filename in pending}
+            for future in as_completed(futures):
+                filename = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    report["failed"][filename] = repr(e)
+                    print(f"Failed to upload {filename}: {e!r}")
+                else:
+                    mark_uploaded([filename])
+                    print(f"Uploaded {filename} to {storage.name}.")
+    return report
 
-    for filename in os.listdir(local_directory):
-        if filename.endswith(".csv"):
-            blob = bucket.blob(f"raw/{filename}")
-            blob.upload_from_filename(os.path.join(local_directory, filename))
-            print(f"Uploaded {filename} to GCS.")
 
-upload_csvs_to_gcs("path/to/your/csvs")
+if __name__ == "__main__":
+    upload_csvs_to_gcs("path/to/your/csvs")
@@ -0,0 +1,100 @@
+# envoi en arrière-plan des fichiers de résultats pendant que l'expérience tourne
+
+import json
+import os
+import sys
+import threading
+
+from upload_cvs_to_GCS import MANIFEST_NAME, file_sha256, load_manifest, save_manifest
+
+DEFAULT_SPOOL = os.path.join("results", ".upload_spool.json")
+
+
+def default_storage():
+    # Imported here so google-cloud-storage is only loaded by the worker thread, never at GUI startup
+    from upload_cvs_to_GCS import GCSStorage
+    return GCSStorage()
+
+
+class UploadQueue:
+    """Uploads finished result files from a background thread.
+
+    Submitted paths are spooled to a JSON file first, so files handed over while offline (or before the app
+    was closed) are sent once the bucket is reachable again, with the retry delay doubling up to
+    max_retry_delay between failures.
+    """
+
+    def __init__(self, spool_path=DEFAULT_SPOOL, storage_factory=default_storage, prefix="raw", retry_delay=5,
+                 max_retry_delay=300):
+        self.spool_path = spool_path
+        self.storage_factory = storage_factory
+        self.prefix = prefix
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        try:
+            with open(spool_path, "r", encoding="utf-8") as f:
+                self.pending = json.load(f)
+        except FileNotFoundError:
+            self.pending = []
+        self.worker = threading.Thread(target=self._run, name="upload-queue", daemon=True)
+        self.worker.start()
+        if self.pending:
+            self.wakeup.set()
+
+    def submit(self, *paths):
+        with self.lock:
+            for path in map(os.path.abspath, paths):  # The app may be launched from another directory next time
+                if path not in self.pending:
+                    self.pending.append(path)
+            self._save_spool()
+        self.wakeup.set()
+
+    def close(self, timeout=2.0):
+        """Stop the worker without waiting on the network; anything not sent yet stays in the spool"""
+        self.stopping.set()
+        self.wakeup.set()
+        self.worker.join(timeout)
+
+    def _save_spool(self):
+        os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+        tmp_path = self.spool_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.pending, f, indent=1)
+        os.replace(tmp_path, self.spool_path)
+
+    def _run(self):
+        storage = None
+        delay = self.retry_delay
+        while not self.stopping.is_set():
+            with self.lock:
+                path = self.pending[0] if self.pending else None
+            if path is None:
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            try:
+                if storage is None:
+                    storage = self.storage_factory()
+                if os.path.exists(path):
+                    storage.upload(path, f"{self.prefix}/{os.path.basename(path)}")
+                    self._record_upload(storage, path)
+            except Exception as e:  # Offline, missing credentials, ...: keep it spooled and retry later
+                print(f"Upload of {path} failed ({e!r}), retrying in {delay}s", file=sys.stderr)
+                self.stopping.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+                continue
+            delay = self.retry_delay
+            with self.lock:
+                self.pending.remove(path)
+                self._save_spool()
+
+    @staticmethod
+    def _record_upload(storage, path):
+        # Share upload_csvs_to_gcs's manifest so a later batch upload skips what was already sent
+        manifest_path = os.path.join(os.path.dirname(path), MANIFEST_NAME)
+        manifest = load_manifest(manifest_path)
+        manifest.setdefault(storage.name, {})[os.path.basename(path)] = file_sha256(path)
+        save_manifest(manifest_path, manifest)
@@ -0,0 +1,10 @@
+import hashlib
+
+
+def file_sha256(path):
+    """Hex SHA-256 of a file's content, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
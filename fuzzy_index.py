@@ -0,0 +1,97 @@
+import sys
+from array import array
+from collections import Counter
+
+from lexicon import fold, load_lexicon
+
+# A wrong word is a spelling near-miss if it is within NEAR_MISS_DISTANCE edits of the target, a neighbour if it is
+# within NEIGHBOUR_WINDOW positions of the target, else a far miss; close_matches returns NEAR_MISS_K words by default
+NEAR_MISS_K = 5
+NEAR_MISS_DISTANCE = 2
+NEIGHBOUR_WINDOW = 10
+ERROR_SPELLING = "spelling"
+ERROR_NEIGHBOUR = "neighbour"
+ERROR_FAR = "far"
+
+
+def edit_distance(a, b, max_distance=None):
+    """Levenshtein distance; once it is certain to exceed max_distance, returns max_distance + 1"""
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+def _qgrams(word, q):
+    padded = " " * (q - 1) + fold(word) + " "
+    return {padded[i:i + q] for i in range(len(padded) - q + 1)}
+
+
+class QGramIndex:
+    """Bigram and trigram postings over a lexicon, for top-k edit distance queries without scanning every word.
+
+    Grams are taken from the folded words, so candidates don't depend on accents or case; distances are computed
+    on the words as written.
+    """
+
+    def __init__(self, mots):
+        self.mots = mots
+        self.postings = {}
+        self.by_length = {}
+        for pos, word in enumerate(mots):
+            for q in (2, 3):
+                for gram in _qgrams(word, q):
+                    self.postings.setdefault(gram, array("I")).append(pos)
+            self.by_length.setdefault(len(word), array("I")).append(pos)
+
+    def candidates(self, word, max_distance):
+        # One edit changes at most q padded q-grams, so closer words share at least |q-grams| - q * max_distance;
+        # trigrams filter best, bigrams still work for shorter words
+        for q in (3, 2):
+            grams = _qgrams(word, q)
+            min_shared = len(grams) - q * max_distance
+            if min_shared > 0:
+                shared = Counter()
+                for gram in grams:
+                    shared.update(self.postings.get(gram, ()))
+                return sorted(pos for pos, count in shared.items() if count >= min_shared)
+        # Too short for either filter: only the lengths within reach
+        return sorted(pos for length in range(max(len(word) - max_distance, 0), len(word) + max_distance + 1)
+                      for pos in self.by_length.get(length, ()))
+
+    def close_matches(self, word, k=NEAR_MISS_K, max_distance=NEAR_MISS_DISTANCE):
+        """Up to k (distance, position) pairs of lexicon words within max_distance edits of word, closest first"""
+        matches = []
+        for pos in self.candidates(word, max_distance):
+            distance = edit_distance(word, self.mots[pos], max_distance)
+            if distance <= max_distance:
+                matches.append((distance, pos))
+        matches.sort()
+        return matches[:k]
+
+
+def classify_wrong_word(word, word_pos, target_word, target_pos):
+    """(error type, edit distance) of selecting word at word_pos instead of the target"""
+    distance = edit_distance(word, target_word)
+    if distance <= NEAR_MISS_DISTANCE:
+        return ERROR_SPELLING, distance
+    if target_pos >= 0 and abs(word_pos - target_pos) <= NEIGHBOUR_WINDOW:
+        return ERROR_NEIGHBOUR, distance
+    return ERROR_FAR, distance
+
+
+if __name__ == "__main__":
+    # Closest spellings of each word given on the command line, e.g. python fuzzy_index.py amour abandon
+    mots = load_lexicon("petit_dictionaire.csv")
+    index = QGramIndex(mots)
+    for query in sys.argv[1:]:
+        print(query, [(mots[pos], distance) for distance, pos in index.close_matches(query)])
@@ -0,0 +1,262 @@
+import csv
+import mmap
+import os
+import sys
+import unicodedata
+from array import array
+from collections.abc import Sequence
+
+# Compiled lexicon layout (native byte order):
+#   header   : magic (4 bytes) | version (uint32) | word count n (uint64)
+#   offsets  : n + 1 uint64, start of each word in the blob
+#   sorted   : n uint32, word positions ordered by UTF-8 bytes (then position), for binary search
+#   collated : n uint32, word positions in French collation order (collation_key, then position)
+#   blob     : UTF-8 words back to back
+# Both position arrays are padded to an even length so the blob stays 8-byte aligned.
+MAGIC = b"LEX1"
+VERSION = 2
+HEADER_SIZE = 16
+COMPILED_EXTENSION = ".lex"
+
+# Letters NFD leaves whole but French dictionaries file as two letters
+_EXPANSIONS = str.maketrans({"œ": "oe", "æ": "ae"})
+
+
+def _decompose(word):
+    """(base letters, combining marks attached to each base letter) of the NFD form of word"""
+    letters = []
+    marks = []
+    for char in unicodedata.normalize("NFD", word):
+        if unicodedata.combining(char) and letters:
+            marks[-1] += char
+        else:
+            letters.append(char)
+            marks.append("")
+    return "".join(letters), marks
+
+
+def fold(word):
+    """Accent- and case-insensitive form of word: abbé, Abbe and ABBÉ all fold to abbe"""
+    return _decompose(word)[0].casefold().translate(_EXPANSIONS)
+
+
+def collation_key(word):
+    """Sort key for French dictionary order.
+
+    Words compare on their folded letters first; ties are broken by accents, compared from the end of the word
+    as French dictionaries do (cote < côte < coté < côté), then by case, lowercase first.
+    """
+    letters, marks = _decompose(word)
+    return (letters.casefold().translate(_EXPANSIONS), tuple(reversed(marks)),
+            tuple(letter != letter.lower() for letter in letters))
+
+
+def compile_lexicon(csv_path, lex_path=None):
+    """Compile a one-word-per-row CSV lexicon into the memory-mappable format, keeping the CSV order"""
+    if lex_path is None:
+        lex_path = compiled_path(csv_path)
+
+    encoded = []
+    with open(csv_path, "r", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        for row in reader:
+            if row:  # Ensure the row is not empty
+                encoded.append(row[0].encode("utf-8"))
+
+    offsets = array("Q", [0])
+    for word in encoded:
+        offsets.append(offsets[-1] + len(word))
+    sorted_positions = array("I", sorted(range(len(encoded)), key=lambda pos: (encoded[pos], pos)))
+    keys = [collation_key(word.decode("utf-8")) for word in encoded]
+    collated_positions = array("I", sorted(range(len(encoded)), key=lambda pos: (keys[pos], pos)))
+    if len(encoded) % 2:
+        sorted_positions.append(0)  # Pad so the blob stays 8-byte aligned
+        collated_positions.append(0)
+
+    tmp_path = f"{lex_path}.{os.getpid()}.tmp"  # Per process: concurrent compiles of the same lexicon don't collide
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(array("I", [VERSION]).tobytes())
+        f.write(array("Q", [len(encoded)]).tobytes())
+        f.write(offsets.tobytes())
+        f.write(sorted_positions.tobytes())
+        f.write(collated_positions.tobytes())
+        for word in encoded:
+            f.write(word)
+    os.replace(tmp_path, lex_path)  # Never leave a half-written lexicon behind
+    return lex_path
+
+
+def compiled_path(csv_path):
+    return os.path.splitext(csv_path)[0] + COMPILED_EXTENSION
+
+
+def load_lexicon(path):
+    """Open a lexicon as a sequence of words.
+
+    A .csv path is compiled next to itself on first use (or when the CSV is newer, or the compiled file is from
+    another format version) and the compiled file is mapped.
+    """
+    if not path.endswith(COMPILED_EXTENSION):
+        lex_path = compiled_path(path)
+        if (not os.path.exists(lex_path) or os.path.getmtime(lex_path) < os.path.getmtime(path)
+                or _compiled_version(lex_path) != VERSION):
+            compile_lexicon(path, lex_path)
+        path = lex_path
+    return MappedLexicon(path)
+
+
+def _compiled_version(lex_path):
+    with open(lex_path, "rb") as f:
+        header = f.read(8)
+    if header[:4] != MAGIC or len(header) < 8:
+        return None
+    return array("I", header[4:8])[0]
+
+
+class MappedLexicon(Sequence):
+    """Read-only word sequence backed by a memory-mapped compiled lexicon; nothing is decoded until accessed"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:4] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a compiled lexicon")
+        view = memoryview(self._mm)
+        version = view[4:8].cast("I")[0]
+        if version != VERSION:
+            view.release()
+            self._mm.close()
+            raise ValueError(f"{path} has lexicon version {version}, expected {VERSION}")
+        self._count = view[8:16].cast("Q")[0]
+
+        offsets_end = HEADER_SIZE + (self._count + 1) * 8
+        sorted_end = offsets_end + (self._count + self._count % 2) * 4
+        collated_end = sorted_end + (self._count + self._count % 2) * 4
+        self._view = view
+        self._offsets = view[HEADER_SIZE:offsets_end].cast("Q")
+        self._sorted = view[offsets_end:sorted_end].cast("I")
+        self._collated = view[sorted_end:collated_end].cast("I")
+        self._blob = view[collated_end:]
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("lexicon index out of range")
+        return str(self._blob[self._offsets[i]:self._offsets[i + 1]], "utf-8")
+
+    def raw(self, i):
+        """Zero-copy UTF-8 bytes of word i"""
+        return self._blob[self._offsets[i]:self._offsets[i + 1]]
+
+    def position(self, word, default=-1):
+        """Position of the first occurrence of `word` (O(log n)), or `default` if absent"""
+        key = word.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(self.raw(self._sorted[mid])) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and self.raw(self._sorted[lo]) == key:
+            return self._sorted[lo]
+        return default
+
+    def find(self, word, default=-1):
+        """Position of the first word equal to `word` up to accents and case (O(log n)), or `default` if none"""
+        key = fold(word)
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if fold(self[self._collated[mid]]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        best = default
+        while lo < self._count and fold(self[self._collated[lo]]) == key:
+            if best == default or self._collated[lo] < best:
+                best = self._collated[lo]
+            lo += 1
+        return best
+
+    def collated(self):
+        """Word positions in French collation order"""
+        return self._collated
+
+    def index(self, word, start=0, stop=None):
+        pos = self.position(word)
+        if pos < 0 or pos < start or (stop is not None and pos >= stop):
+            return super().index(word, start, self._count if stop is None else stop)
+        return pos
+
+    def __contains__(self, word):
+        return self.position(word) >= 0
+
+    def close(self):
+        for view in (self._offsets, self._sorted, self._collated, self._blob, self._view):
+            view.release()
+        self._mm.close()
+
+
+class _PositionIndex:
+    """Word -> position lookup: exact match first, then ignoring accents and case"""
+
+    def get(self, word, default=None):
+        pos = self.lookup(word)
+        return default if pos < 0 else pos
+
+    def __contains__(self, word):
+        return self.lookup(word) >= 0
+
+    def __getitem__(self, word):
+        pos = self.lookup(word)
+        if pos < 0:
+            raise KeyError(word)
+        return pos
+
+
+class _MappedPositionIndex(_PositionIndex):
+    def __init__(self, lexicon):
+        self.lexicon = lexicon
+
+    def lookup(self, word):
+        pos = self.lexicon.position(word)
+        return pos if pos >= 0 else self.lexicon.find(word)
+
+
+class _ListPositionIndex(_PositionIndex):
+    def __init__(self, mots):
+        self.exact = {}
+        self.folded = {}
+        for pos, mot in enumerate(mots):
+            self.exact.setdefault(mot, pos)
+            self.folded.setdefault(fold(mot), pos)
+
+    def lookup(self, word):
+        pos = self.exact.get(word)
+        return pos if pos is not None else self.folded.get(fold(word), -1)
+
+
+def position_index(mots):
+    """Word -> first position mapping that falls back to accent- and case-insensitive matching.
+
+    A view over a MappedLexicon's sorted and collated indexes, or dicts built once for lists.
+    """
+    if isinstance(mots, MappedLexicon):
+        return _MappedPositionIndex(mots)
+    return _ListPositionIndex(mots)
+
+
+if __name__ == "__main__":
+    # Compile each lexicon given on the command line, e.g. python lexicon.py final_cleaned_dictionary.csv
+    for csv_path in sys.argv[1:] or ["petit_dictionaire.csv", "final_cleaned_dictionary.csv"]:
+        print(f"Compiled {csv_path} -> {compile_lexicon(csv_path)}")
@@ -0,0 +1,113 @@
+import contextlib
+import glob
+import hashlib
+import os
+import sys
+import unicodedata
+
+import numpy as np
+
+from file_hash import file_sha256
+from lexicon import load_lexicon
+
+# Bump when a table changes, so cached tables are rebuilt
+TABLES_VERSION = 2
+TABLES_SUFFIX = ".tables.npy"
+ALPHABET = "abcdefghijklmnopqrstuvwxyz"
+N_LETTER_CODES = len(ALPHABET) + 1  # 0 = no letter (end of word, digit, punctuation)
+
+# One record per word, in lexicon order
+WORD_TABLE = np.dtype([
+    ("letter_key", np.float64),  # alphabetical position in [0, 1) from the first three letters (letter_keys)
+    ("normalized_position", np.float64),  # position / (n - 1)
+    ("letter_code", np.int16),  # first letter, 1-26 (accents and case ignored)
+    ("bigram_code", np.int16),  # first two letters, letter_code * 27 + second letter code
+    ("letter_start", np.int32),  # first and last positions of the run of consecutive words sharing the first letter
+    ("letter_end", np.int32),
+    ("bigram_start", np.int32),  # same for the first two letters
+    ("bigram_end", np.int32),
+    ("interpolation_guess", np.int32),  # first interpolation-search jump toward the word over the whole lexicon
+])
+
+
+def _ascii_fold(word):
+    return unicodedata.normalize("NFD", word).encode("ascii", "ignore").decode().lower()
+
+
+def letter_keys(words, letters=3):
+    """Alphabetical position of each word in [0, 1) from its first letters (accents and case ignored)"""
+    keys = np.zeros(len(words))
+    for i, word in enumerate(words):
+        key, scale = 0.0, 1.0
+        for char in _ascii_fold(word)[:letters]:
+            scale /= N_LETTER_CODES
+            key += (ALPHABET.find(char) + 1) * scale
+        keys[i] = key
+    return keys
+
+
+def _run_bounds(codes):
+    # Lexicons are in code-point order (accented and capitalised words don't sort with their letter), so a bucket
+    # is the run of consecutive words sharing a code, as they appear in the interfaces
+    change = np.r_[True, codes[1:] != codes[:-1]]
+    run = np.cumsum(change) - 1
+    starts = np.flatnonzero(change).astype(np.int32)
+    ends = np.r_[starts[1:] - 1, len(codes) - 1].astype(np.int32)
+    return starts[run], ends[run]
+
+
+def build_tables(words):
+    """Per-word lookup tables for search modelling, in lexicon order"""
+    n = len(words)
+    table = np.zeros(n, dtype=WORD_TABLE)
+    if n == 0:
+        return table
+    folded = [_ascii_fold(word) for word in words]
+    first = np.array([ALPHABET.find(word[:1]) + 1 if word else 0 for word in folded], dtype=np.int16)
+    second = np.array([ALPHABET.find(word[1:2]) + 1 if len(word) > 1 else 0 for word in folded], dtype=np.int16)
+    keys = letter_keys(words)
+    table["letter_key"] = keys
+    table["normalized_position"] = np.arange(n) / max(n - 1, 1)
+    table["letter_code"] = first
+    table["bigram_code"] = first * N_LETTER_CODES + second
+    table["letter_start"], table["letter_end"] = _run_bounds(first)
+    table["bigram_start"], table["bigram_end"] = _run_bounds(table["bigram_code"])
+    # Same rule as the interpolation_search model, with the first and last words as bounds
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.where(keys[-1] > keys[0], (keys - keys[0]) / (keys[-1] - keys[0]), 0.5)
+    table["interpolation_guess"] = np.rint((n - 1) * np.clip(fraction, 0, 1))
+    return table
+
+
+def source_digest(path):
+    return hashlib.sha256(f"{TABLES_VERSION}:{file_sha256(path)}".encode()).hexdigest()[:16]
+
+
+def tables_path(lexicon_path):
+    return f"{lexicon_path}.{source_digest(lexicon_path)}{TABLES_SUFFIX}"
+
+
+def load_tables(lexicon_path):
+    """Memory-mapped WORD_TABLE records of a lexicon (.csv or .lex).
+
+    Tables are built on first use and cached next to the lexicon under the hash of its file, so an edited
+    dictionary gets new tables and every process maps the same file.
+    """
+    path = tables_path(lexicon_path)
+    if not os.path.exists(path):
+        for stale in glob.glob(glob.escape(lexicon_path) + ".*" + TABLES_SUFFIX):
+            if stale != path:  # Another process may have just built the current tables
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(stale)  # Tables of an older version of the file
+        words = load_lexicon(lexicon_path)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"  # Per process, like compile_lexicon
+        np.save(tmp_path, build_tables(words))
+        os.replace(tmp_path, path)
+    return np.load(path, mmap_mode="r")
+
+
+if __name__ == "__main__":
+    # Build the tables of each lexicon given, e.g. python lexicon_tables.py final_cleaned_dictionary.csv
+    for lexicon_path in sys.argv[1:] or ["petit_dictionaire.csv", "final_cleaned_dictionary.csv"]:
+        tables = load_tables(lexicon_path)
+        print(f"{lexicon_path}: {len(tables)} words -> {tables_path(lexicon_path)}")
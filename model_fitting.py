@@ -0,0 +1,179 @@
+import csv
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lexicon_tables import load_tables
+from trajectory_analysis import load_trajectories
+
+# Bump when a model or its parameter grid changes, so cached fits are recomputed
+MODEL_VERSION = 1
+LAPSE = 0.01  # Share of each step's likelihood spread uniformly over the lexicon, so no sample has zero probability
+
+
+def prepare_steps(position, trial, target_pos, n_words):
+    """Per logged sample: the previous position and the search bounds known before the move (all relative).
+
+    Every trial starts on the first dictionary word, so the first sample's previous position is -target_pos.
+    Bounds are the closest positions seen so far on each side of the target.
+    """
+    first = np.r_[True, trial[1:] != trial[:-1]]
+    prev = np.where(first, -target_pos, np.r_[0, position[:-1]])
+    floor, ceiling = -target_pos, n_words - 1 - target_pos
+    # Running max/min restarted at each trial: offsetting by the trial number keeps trials from mixing
+    span = 2 * n_words + 1
+    offset = trial.astype(np.int64) * span
+    lo = np.maximum.accumulate(np.where(prev < 0, prev, floor) + offset) - offset
+    hi = -(np.maximum.accumulate(-np.where(prev > 0, prev, ceiling) + offset) - offset)
+    return {"position": position, "prev": prev, "lo": lo, "hi": hi, "target_pos": target_pos}
+
+
+def _normal_mixture_loglik(x, mu, sd, n_words, lapse=LAPSE):
+    density = np.exp(-0.5 * ((x - mu) / sd) ** 2) / (sd * np.sqrt(2 * np.pi))
+    return np.log((1 - lapse) * density + lapse / n_words).sum(axis=-1)
+
+
+def binary_search_loglik(steps, n_words, target_keys, keys, grid):
+    # Next position expected halfway between the current bounds
+    mu = (steps["lo"] + steps["hi"]) / 2
+    sd = grid["sigma"][:, None] * n_words
+    return _normal_mixture_loglik(steps["position"], mu, sd, n_words)
+
+
+def interpolation_search_loglik(steps, n_words, target_keys, keys, grid):
+    # Next position interpolated between the bounds from the letters of the bound words and of the target
+    lo_key = keys[np.clip(steps["lo"] + steps["target_pos"], 0, n_words - 1)]
+    hi_key = keys[np.clip(steps["hi"] + steps["target_pos"], 0, n_words - 1)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.where(hi_key > lo_key, (target_keys - lo_key) / (hi_key - lo_key), 0.5)
+    mu = steps["lo"] + (steps["hi"] - steps["lo"]) * np.clip(fraction, 0, 1)
+    sd = grid["sigma"][:, None] * n_words
+    return _normal_mixture_loglik(steps["position"], mu, sd, n_words)
+
+
+def linear_scan_loglik(steps, n_words, target_keys, keys, grid):
+    # Small steps toward the target, or with probability p_jump a jump anywhere in the lexicon
+    prev = steps["prev"]
+    mu = prev - np.sign(prev) * grid["step"][:, None]
+    sd = grid["sigma"][:, None]
+    lapse = grid["p_jump"][:, None] + LAPSE
+    return _normal_mixture_loglik(steps["position"], mu, sd, n_words, lapse)
+
+
+def _product_grid(**axes):
+    mesh = np.meshgrid(*axes.values(), indexing="ij")
+    return {name: values.ravel() for name, values in zip(axes, mesh)}
+
+
+MODELS = {
+    "binary_search": (binary_search_loglik, _product_grid(sigma=np.geomspace(1e-4, 0.5, 48))),
+    "interpolation_search": (interpolation_search_loglik, _product_grid(sigma=np.geomspace(1e-4, 0.5, 48))),
+    "linear_scan": (linear_scan_loglik, _product_grid(p_jump=np.linspace(0.0, 0.9, 10),
+                                                      step=np.geomspace(1, 500, 12),
+                                                      sigma=np.geomspace(1, 1000, 12))),
+}
+
+
+def fit_model(model, steps, n_words, target_keys, keys, chunk=256):
+    """Grid maximum likelihood, with the grid evaluated in vectorized chunks"""
+    loglik_fn, grid = MODELS[model]
+    n_grid = len(next(iter(grid.values())))
+    loglik = np.concatenate([
+        loglik_fn(steps, n_words, target_keys, keys, {name: values[i:i + chunk] for name, values in grid.items()})
+        for i in range(0, n_grid, chunk)
+    ])
+    best = int(np.argmax(loglik))
+    n = len(steps["position"])
+    k = len(grid)
+    return {
+        "params": {name: float(values[best]) for name, values in grid.items()},
+        "loglik": float(loglik[best]),
+        "n_samples": n,
+        "aic": 2 * k - 2 * float(loglik[best]),
+        "bic": k * np.log(max(n, 1)) - 2 * float(loglik[best]),
+    }
+
+
+def _fit_task(task):
+    participant, model, arrays, n_words, keys = task
+    steps = prepare_steps(arrays["position"], arrays["trial"], arrays["target_pos"], n_words)
+    target_keys = keys[np.clip(arrays["target_pos"], 0, n_words - 1)]
+    return participant, model, fit_model(model, steps, n_words, target_keys, keys)
+
+
+def _task_key(participant, model, arrays, lexicon_digest):
+    digest = hashlib.sha256(f"{MODEL_VERSION}:{model}:{participant}:{lexicon_digest}".encode())
+    for name in sorted(arrays):
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    return digest.hexdigest()
+
+
+def fit_corpus(results="results", lexicon_path="petit_dictionaire.csv", models=None, cache_path="model_fits.json",
+               workers=None):
+    """Fit every model to every participant's trajectories in a process pool; fits already in the cache are reused"""
+    models = models or list(MODELS)
+    keys = np.ascontiguousarray(load_tables(lexicon_path)["letter_key"])
+    n_words = len(keys)
+    lexicon_digest = hashlib.sha256(keys.tobytes()).hexdigest()
+
+    trajectories = load_trajectories(results)
+    known = trajectories["target_pos"] >= 0  # -1 when the target was missing from the lexicon
+    by_participant = {}
+    for participant in np.unique(trajectories["participant"][known]):
+        rows = np.flatnonzero(known & (trajectories["participant"] == participant))
+        # Trials renumbered within the participant, in (session file, target word) order: global trial ids and
+        # target codes shift when other sessions are added, and would change the cache key
+        _, first, trial = np.unique(trajectories["trial"][rows], return_index=True, return_inverse=True)
+        rank = np.empty(len(first), dtype=np.int64)
+        rank[np.lexsort((trajectories["target_words"][trajectories["target"][rows[first]]],
+                         trajectories["session_files"][trajectories["session"][rows[first]]]))] = np.arange(len(first))
+        trial = rank[trial]
+        order = np.argsort(trial, kind="stable")
+        rows = rows[order]
+        by_participant[int(participant)] = {
+            "position": trajectories["position"][rows].astype(np.int64),
+            "trial": trial[order],
+            "target_pos": trajectories["target_pos"][rows].astype(np.int64),
+        }
+
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except FileNotFoundError:
+        cache = {}
+
+    tasks, fits = [], {}
+    for participant, arrays in by_participant.items():
+        for model in models:
+            key = _task_key(participant, model, arrays, lexicon_digest)
+            if key in cache:
+                fits[(participant, model)] = cache[key]
+            else:
+                tasks.append((key, (participant, model, arrays, n_words, keys)))
+
+    if tasks:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for (key, _), (participant, model, fit) in zip(tasks, pool.map(_fit_task, [t for _, t in tasks])):
+                cache[key] = fits[(participant, model)] = fit
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, cache_path)
+    return fits
+
+
+if __name__ == "__main__":
+    results = sys.argv[1] if len(sys.argv) > 1 else "results"
+    lexicon_path = sys.argv[2] if len(sys.argv) > 2 else "petit_dictionaire.csv"
+    fits = fit_corpus(results, lexicon_path)
+    with open("model_fits.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["participant", "model", "loglik", "aic", "bic", "n_samples", "params"])
+        for (participant, model), fit in sorted(fits.items()):
+            writer.writerow([participant, model, fit["loglik"], fit["aic"], fit["bic"], fit["n_samples"],
+                             json.dumps(fit["params"])])
+    print(f"Fitted {len(fits)} participant/model pairs, written to model_fits.csv")
@@ -0,0 +1,319 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from file_hash import file_sha256
+from lexicon import load_lexicon, position_index
+from results_store import STEP_COLUMNS, parse_pairs, save_results
+
+INGEST_VERSION = 2
+DEFAULT_OUTPUT = os.path.join("results", "results_canonical.npz")
+DEFAULT_REPORT = os.path.join("results", "ingest_report.json")
+DEFAULT_CACHE = os.path.join("results", "ingest_cache.json")
+# Session files named by interface.py (p2_at_20251018_200102.csv) and interface_2.py (22_20251018_185049.csv)
+FILE_SCHEMES = {
+    "interface": re.compile(r"^p(\d+)_at_(\d{8}_\d{6})\.csv$"),
+    "interface_2": re.compile(r"^(\d+)_(\d{8}_\d{6})\.csv$"),
+}
+# Below this many files to parse, a process pool costs more than it saves
+MIN_POOL_FILES = 16
+
+
+def _file_scheme(name):
+    for scheme, pattern in FILE_SCHEMES.items():
+        match = pattern.match(name)
+        if match:
+            return scheme, int(match.group(1)), match.group(2)
+    return "unknown", None, None
+
+
+def _columns(header):
+    """Column index of each field, for the full (position_time_pairs) and delta (first_step) layouts"""
+    if "target_word" not in header:
+        return None
+    pairs = "new_position_time_pairs" if "new_position_time_pairs" in header else "position_time_pairs"
+    return {"participant": header.index("participant_number") if "participant_number" in header else None,
+            "target_word": header.index("target_word"), "target_pos": header.index("target_word_pos"),
+            "pairs": header.index(pairs), "first_step": header.index("first_step") if "first_step" in header else None}
+
+
+def _dedupe_samples(pairs):
+    """Keep mask dropping each sample identical to the one before it"""
+    keep = [True] * len(pairs)
+    for i in range(1, len(pairs)):
+        keep[i] = pairs[i] != pairs[i - 1]
+    return keep
+
+
+def ingest_file(path):
+    """Parse one results CSV into canonical trials plus the counts of what was repaired.
+
+    A trial is one target of one participant in the session. Its attempts (one per stop_timer row) are merged into a single
+    trajectory in which every sample appears once; `attempts` holds the step at which each wrong selection
+    ended an attempt (the trajectory's length if it ended before any new sample).
+    """
+    name = os.path.basename(path)
+    scheme, file_participant, timestamp = _file_scheme(name)
+    issues = Counter()
+    if scheme == "unknown":
+        issues["unknown_file_name"] += 1
+    trials = {}
+    last_rows = {}
+    participants = set()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        columns = _columns(header)
+        if columns is None:
+            # Headerless file in the original four-column layout
+            issues["missing_header"] += 1
+            columns = _columns(["participant_number", "target_word", "target_word_pos", "position_time_pairs"])
+            reader = [header] + list(reader) if header else []
+        for row in reader:
+            try:
+                target_word = row[columns["target_word"]]
+                target_pos = int(row[columns["target_pos"]])
+                pairs = [[int(position), float(t)] for position, t in parse_pairs(row[columns["pairs"]])]
+                participant = int(row[columns["participant"]]) if columns["participant"] is not None \
+                    else file_participant
+                first_step = int(row[columns["first_step"]]) if columns["first_step"] is not None else None
+            except (IndexError, ValueError, TypeError, SyntaxError):
+                issues["unparsable_row"] += 1
+                continue
+            participants.add(participant)
+            key = (participant, target_word)  # Simulated files hold several participants
+            if last_rows.get(key) == row:
+                issues["duplicate_attempt"] += 1  # The same row written twice, word_found and first_step included
+                continue
+            last_rows[key] = row
+            known = key in trials
+            trial = trials.setdefault(key, {"target_word": target_word, "target_pos": target_pos,
+                                                    "participant": participant, "pairs": [], "attempts": []})
+            if target_pos != trial["target_pos"]:
+                issues["inconsistent_target_pos"] += 1
+            previous = trial["pairs"]
+            if first_step is not None:
+                pairs = previous[:first_step] + pairs  # Delta rows hold only the attempt's new samples
+            if known:
+                if pairs[:len(previous)] != previous:
+                    issues["rewritten_prefix"] += 1  # The later row is kept as the more complete record
+                if first_step is not None:
+                    # Samples are only logged at reversals and dwells, so an attempt may add none
+                    end = first_step
+                else:
+                    end = 0
+                    while end < min(len(previous), len(pairs)) and pairs[end] == previous[end]:
+                        end += 1
+                trial["attempts"] = [step for step in trial["attempts"] if step <= end] + [end]
+            trial["pairs"] = pairs
+
+    for trial in trials.values():
+        keep = _dedupe_samples(trial["pairs"])
+        issues["duplicate_sample"] += keep.count(False)
+        kept_before = [0]
+        for flag in keep:
+            kept_before.append(kept_before[-1] + flag)
+        trial["attempts"] = [kept_before[step] for step in trial["attempts"]]
+        trial["pairs"] = [pair for pair, flag in zip(trial["pairs"], keep) if flag]
+        times = [t for _, t in trial["pairs"]]
+        if any(later < earlier for earlier, later in zip(times, times[1:])):
+            issues["time_not_monotonic"] += 1
+    if file_participant is not None and participants - {file_participant}:
+        issues["participant_mismatch"] += 1
+    return {"scheme": scheme, "timestamp": timestamp, "trials": list(trials.values()),
+            "issues": {issue: count for issue, count in issues.items() if count}}
+
+
+def _load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return cache.get("files", {}) if cache.get("version") == INGEST_VERSION else {}
+
+
+def _save_cache(path, files):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": INGEST_VERSION, "files": files}, f)
+    os.replace(tmp_path, path)
+
+
+def parse_files(paths, cache_path=DEFAULT_CACHE, workers=None):
+    """{file name: ingest_file() result}, reparsing in a process pool only the files whose content changed"""
+    cached = _load_cache(cache_path)
+    files = {}
+    todo = []
+    touched = False
+    for path in paths:
+        name = os.path.basename(path)
+        stat = os.stat(path)
+        entry = cached.get(name)
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            files[name] = entry
+            continue
+        sha256 = file_sha256(path)
+        if entry and entry["sha256"] == sha256:
+            entry["mtime_ns"] = stat.st_mtime_ns  # Touched or copied, same content: saved so it isn't hashed again
+            files[name] = entry
+            touched = True
+            continue
+        files[name] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha256}
+        todo.append(path)
+
+    if len(todo) >= MIN_POOL_FILES and workers != 1:
+        workers = workers or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(ingest_file, todo, chunksize=max(1, len(todo) // (4 * workers))))
+    else:
+        parsed = [ingest_file(path) for path in todo]
+    for path, result in zip(todo, parsed):
+        files[os.path.basename(path)]["result"] = result
+    if todo or touched or set(cached) != set(files):
+        _save_cache(cache_path, files)
+    return files, len(todo)
+
+
+def check_target_positions(files, lexicon_path):
+    """Per file, the trials whose target_word_pos does not point at their word in the lexicon"""
+    mots = load_lexicon(lexicon_path)
+    index = position_index(mots)
+    checked = {}
+    mismatches = {}
+    for name, entry in files.items():
+        for trial in entry["result"]["trials"]:
+            key = (trial["target_word"], trial["target_pos"])
+            if key not in checked:
+                word, pos = key
+                if 0 <= pos < len(mots) and mots[pos] == word:
+                    checked[key] = None
+                else:
+                    checked[key] = index.get(word, -1)
+                    if checked[key] == pos:
+                        checked[key] = None  # Missing from the lexicon and logged as -1, like the interfaces do
+            if checked[key] is not None:
+                mismatches.setdefault(name, []).append({"target_word": trial["target_word"],
+                                                        "target_pos": trial["target_pos"],
+                                                        "lexicon_pos": checked[key]})
+    if hasattr(mots, "close"):
+        mots.close()
+    return mismatches
+
+
+def build_canonical(files, names):
+    """Typed step columns of the given sessions, with each sample stored once.
+
+    `attempt` is the attempt during which the step was logged (the number of wrong selections before it), and the
+    store carries canonical=True so load_trajectories keeps every step of a trial. An attempt that logged no sample
+    has no step, so trial_session / trial_target / trial_attempts also give each trial's number of attempts.
+    """
+    target_codes = {}
+    per_trial = {"session": [], "participant": [], "target": [], "target_pos": []}
+    trial_attempts = []
+    lengths, attempts, positions, times = [], [], [], []
+    for session, name in enumerate(names):
+        for trial in files[name]["result"]["trials"]:
+            per_trial["session"].append(session)
+            per_trial["participant"].append(trial["participant"] if trial["participant"] is not None else -1)
+            per_trial["target"].append(target_codes.setdefault(trial["target_word"], len(target_codes)))
+            per_trial["target_pos"].append(trial["target_pos"])
+            trial_attempts.append(len(trial["attempts"]) + 1)
+            lengths.append(len(trial["pairs"]))
+            ended = 0
+            for step, (position, t) in enumerate(trial["pairs"]):
+                while ended < len(trial["attempts"]) and trial["attempts"][ended] <= step:
+                    ended += 1
+                attempts.append(ended)
+                positions.append(position)
+                times.append(t)
+
+    # Per-step columns repeat the per-trial values, without building a small array per trial
+    lengths = np.array(lengths, dtype=np.int64)
+    columns = {name: np.repeat(np.array(values, dtype=np.int64), lengths) for name, values in per_trial.items()}
+    starts = np.cumsum(lengths) - lengths
+    columns["step"] = np.arange(lengths.sum()) - np.repeat(starts, lengths)
+    columns["attempt"] = np.array(attempts, dtype=np.int64)
+    columns["position"] = np.array(positions, dtype=np.int64)
+    columns["time"] = np.array(times, dtype=np.float64)
+
+    store = {}
+    for column, dtype in STEP_COLUMNS.items():
+        store[column] = columns[column].astype(dtype)
+    store["session_files"] = np.array(names, dtype=str)
+    store["target_words"] = np.array(list(target_codes), dtype=str)
+    store["trial_session"] = np.array(per_trial["session"], dtype=np.int32)
+    store["trial_target"] = np.array(per_trial["target"], dtype=np.int32)
+    store["trial_attempts"] = np.array(trial_attempts, dtype=np.int32)
+    store["canonical"] = np.array(True)
+    return store
+
+
+def ingest_results(results_dir="results", lexicon_path="petit_dictionaire.csv", output=None, report_path=None,
+                   cache_path=None, workers=None):
+    """Validate and repair every results CSV in `results_dir` into one canonical store and a JSON report"""
+    output = output or os.path.join(results_dir, os.path.basename(DEFAULT_OUTPUT))
+    report_path = report_path or os.path.join(results_dir, os.path.basename(DEFAULT_REPORT))
+    cache_path = cache_path or os.path.join(results_dir, os.path.basename(DEFAULT_CACHE))
+    paths = sorted(glob.glob(os.path.join(results_dir, "*.csv")))
+    files, n_parsed = parse_files(paths, cache_path, workers)
+
+    # The same session synced twice under different names is kept once
+    names = []
+    duplicates = {}
+    first_with_hash = {}
+    for name, entry in files.items():
+        original = first_with_hash.setdefault(entry["sha256"], name)
+        if original == name:
+            names.append(name)
+        else:
+            duplicates[name] = original
+
+    store = build_canonical(files, names)
+    save_results(output, store)
+    issues = Counter()
+    for name in names:
+        issues.update(files[name]["result"]["issues"])
+    mismatches = check_target_positions({name: files[name] for name in names}, lexicon_path)
+    issues["target_pos_mismatch"] = sum(len(trials) for trials in mismatches.values())
+    report = {
+        "files": len(paths),
+        "parsed": n_parsed,
+        "sessions": len(names),
+        "trials": sum(len(files[name]["result"]["trials"]) for name in names),
+        "steps": len(store["time"]),
+        "schemes": Counter(files[name]["result"]["scheme"] for name in names),
+        "issues": {issue: count for issue, count in sorted(issues.items()) if count},
+        "duplicate_files": duplicates,
+        "target_pos_mismatches": mismatches,
+        "files_with_issues": {name: files[name]["result"]["issues"] for name in names
+                              if files[name]["result"]["issues"]},
+    }
+    tmp_path = report_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1, ensure_ascii=False)
+    os.replace(tmp_path, report_path)
+    return output, report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate, repair and consolidate the results CSVs into one store")
+    parser.add_argument("results_dir", nargs="?", default="results")
+    parser.add_argument("--lexicon", default="petit_dictionaire.csv")
+    parser.add_argument("--output")
+    parser.add_argument("--report")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    output, report = ingest_results(args.results_dir, args.lexicon, args.output, args.report, workers=args.workers)
+    print(f"Parsed {report['parsed']} of {report['files']} files; wrote {report['steps']} steps from "
+          f"{report['sessions']} sessions to {output}")
+    for issue, count in report["issues"].items():
+        print(f"  {issue}: {count}")
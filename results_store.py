@@ -0,0 +1,110 @@
+import ast
+import csv
+import glob
+import json
+import os
+import sys
+
+import numpy as np
+
+# One row per (session, participant, target, attempt, step); every stop_timer call is an attempt
+STEP_COLUMNS = {
+    "session": np.int32,  # index into session_files
+    "participant": np.int32,
+    "target": np.int32,  # index into target_words
+    "target_pos": np.int32,
+    "attempt": np.int32,
+    "step": np.int32,
+    "position": np.int32,  # position relative to the target word
+    "time": np.float64,  # seconds since start_timer
+}
+DEFAULT_STORE = os.path.join("results", "results_store.npz")
+# Columns of the results CSV written by interface.py's stop_timer (and by simulator.py); older files have the first
+# three columns followed by the whole trajectory in position_time_pairs
+RESULTS_HEADER = ["participant_number", "target_word", "target_word_pos", "new_position_time_pairs", "word_found",
+                  "error_type", "edit_distance", "first_step"]
+
+
+def parse_pairs(cell):
+    # position_time_pairs is the repr of a list of [int, float] lists, which is also valid JSON
+    try:
+        return json.loads(cell)
+    except ValueError:
+        return ast.literal_eval(cell)
+
+
+def read_results_csv(path):
+    """Yield (participant_number, target_word, target_word_pos, position_time_pairs) for each row of a results CSV.
+
+    Files with a first_step column hold only each attempt's new pairs; they are expanded so every row carries the
+    trial's whole trajectory so far, as in the older files.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        first_step_column = header.index("first_step") if "first_step" in header else None
+        trajectories = {}
+        for row in reader:
+            if len(row) < 4:
+                continue
+            pairs = parse_pairs(row[3])
+            if first_step_column is not None and len(row) > first_step_column:
+                trial = (row[0], row[1])  # Simulated files hold several participants
+                pairs = trajectories.get(trial, [])[:int(row[first_step_column])] + pairs
+                trajectories[trial] = pairs
+            yield int(row[0]), row[1], int(row[2]), pairs
+
+
+def build_columns(result_files):
+    """Flatten result CSVs into typed step columns plus the session_files / target_words lookup tables"""
+    target_codes = {}
+    columns = {name: [] for name in STEP_COLUMNS}
+    for session, path in enumerate(result_files):
+        attempts = {}
+        for participant, target_word, target_pos, pairs in read_results_csv(path):
+            target = target_codes.setdefault(target_word, len(target_codes))
+            attempt = attempts.get((participant, target), 0)
+            attempts[(participant, target)] = attempt + 1
+            n = len(pairs)
+            columns["session"].append(np.full(n, session))
+            columns["participant"].append(np.full(n, participant))
+            columns["target"].append(np.full(n, target))
+            columns["target_pos"].append(np.full(n, target_pos))
+            columns["attempt"].append(np.full(n, attempt))
+            columns["step"].append(np.arange(n))
+            columns["position"].append(np.array([pair[0] for pair in pairs], dtype=np.int64))
+            columns["time"].append(np.array([pair[1] for pair in pairs], dtype=np.float64))
+
+    store = {}
+    for name, dtype in STEP_COLUMNS.items():
+        store[name] = np.concatenate(columns[name]).astype(dtype) if columns[name] else np.empty(0, dtype=dtype)
+    store["session_files"] = np.array([os.path.basename(path) for path in result_files], dtype=str)
+    store["target_words"] = np.array(list(target_codes), dtype=str)
+    return store
+
+
+def save_results(path, store):
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **store)
+    os.replace(tmp_path, path)  # Readers never see a half-written store
+
+
+def load_results(path=DEFAULT_STORE):
+    """Load the whole corpus as a dict of contiguous arrays in one read"""
+    with np.load(path, allow_pickle=False) as f:
+        return {name: f[name] for name in f.files}
+
+
+def convert_results(results_dir="results", output=None):
+    """Convert every results CSV in `results_dir` into a single columnar store"""
+    output = output or os.path.join(results_dir, os.path.basename(DEFAULT_STORE))
+    result_files = sorted(glob.glob(os.path.join(results_dir, "*.csv")))
+    store = build_columns(result_files)
+    save_results(output, store)
+    return output, store
+
+
+if __name__ == "__main__":
+    results_dir = sys.argv[1] if len(sys.argv) > 1 else "results"
+    output, store = convert_results(results_dir)
+    print(f"Wrote {len(store['time'])} steps from {len(store['session_files'])} sessions to {output}")
@@ -0,0 +1,159 @@
+import argparse
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lexicon import load_lexicon
+from lexicon_tables import load_tables
+from results_store import RESULTS_HEADER
+
+# Parameters use the same names and scales as the fitted models in model_fitting.py
+DEFAULT_PARAMS = {
+    "binary_search": {"sigma": 0.02},
+    "interpolation_search": {"sigma": 0.02},
+    "linear_scan": {"p_jump": 0.1, "step": 20.0, "sigma": 10.0},
+}
+
+_words = None
+_keys = None
+
+
+def _init_worker(lexicon_path):
+    # Each worker maps the compiled lexicon and its cached tables once instead of receiving them with every chunk
+    global _words, _keys
+    _words = load_lexicon(lexicon_path)
+    _keys = load_tables(lexicon_path)["letter_key"]
+
+
+def next_positions(strategy, params, rng, prev, lo, hi, target_pos, target_keys, keys, n_words):
+    """Vectorized next relative position for every active trial (same rules as the model likelihoods)"""
+    if strategy == "binary_search":
+        mu = (lo + hi) / 2
+        return mu + rng.normal(0, params["sigma"] * n_words, len(prev))
+    if strategy == "interpolation_search":
+        lo_key = keys[lo + target_pos]
+        hi_key = keys[hi + target_pos]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.where(hi_key > lo_key, (target_keys - lo_key) / (hi_key - lo_key), 0.5)
+        mu = lo + (hi - lo) * np.clip(fraction, 0, 1)
+        return mu + rng.normal(0, params["sigma"] * n_words, len(prev))
+    if strategy == "linear_scan":
+        scan = prev - np.sign(prev) * params["step"] + rng.normal(0, params["sigma"], len(prev))
+        jump = rng.integers(0, n_words, len(prev)) - target_pos
+        return np.where(rng.random(len(prev)) < params["p_jump"], jump, scan)
+    raise ValueError(f"unknown strategy {strategy!r}")
+
+
+def sample_targets(rng, n_words, n_trials, trials_per_participant):
+    """Target positions, distinct within each participant's block of trials (Floyd's sampling, vectorized)"""
+    if trials_per_participant > n_words:
+        raise ValueError(f"{trials_per_participant} distinct targets per participant from {n_words} words")
+    n_blocks = -(-n_trials // trials_per_participant)
+    targets = np.empty((n_blocks, trials_per_participant), dtype=np.int64)
+    for i, j in enumerate(range(n_words - trials_per_participant, n_words)):
+        drawn = rng.integers(0, j + 1, n_blocks)
+        taken = (targets[:, :i] == drawn[:, None]).any(axis=1)
+        targets[:, i] = np.where(taken, j, drawn)
+    return rng.permuted(targets, axis=1).ravel()[:n_trials]
+
+
+def simulate_chunk(task):
+    """Simulate a batch of trials in lockstep and return them as results-CSV text"""
+    (strategy, params, n_trials, seed, first_participant, trials_per_participant, max_steps, capture,
+     dwell_median, dwell_spread) = task
+    rng = np.random.default_rng(seed)
+    n_words = len(_words)
+    # A participant never gets the same target twice, or readers would merge the two trials into one
+    target_pos = sample_targets(rng, n_words, n_trials, trials_per_participant)
+    target_keys = _keys[target_pos]
+
+    # Every trial starts on the first dictionary word, like in DictionnaireApp
+    position = -target_pos
+    lo, hi = -target_pos, n_words - 1 - target_pos
+    elapsed = np.zeros(n_trials)
+    active = position != 0
+    sample_positions = np.zeros((max_steps, n_trials), dtype=np.int64)
+    sample_times = np.zeros((max_steps, n_trials))
+    n_samples = np.zeros(n_trials, dtype=np.int64)
+
+    for step in range(max_steps):
+        if not active.any():
+            break
+        index = np.flatnonzero(active)
+        moved = next_positions(strategy, params, rng, position[index], lo[index], hi[index], target_pos[index],
+                               target_keys[index], _keys, n_words)
+        moved = np.clip(np.rint(moved).astype(np.int64), -target_pos[index], n_words - 1 - target_pos[index])
+        moved[np.abs(moved) <= capture] = 0  # Close enough to read the target off the neighbouring words
+        elapsed[index] += dwell_median * np.exp(rng.normal(0, dwell_spread, len(index)))
+        sample_positions[step, index] = moved
+        sample_times[step, index] = elapsed[index]
+        n_samples[index] += 1
+        lo[index] = np.where(moved < 0, np.maximum(lo[index], moved), lo[index])
+        hi[index] = np.where(moved > 0, np.minimum(hi[index], moved), hi[index])
+        position[index] = moved
+        active[index] = moved != 0
+
+    out = io.StringIO()
+    writer = csv.writer(out)
+    rounded_times = np.round(sample_times, 2)
+    for trial in range(n_trials):
+        n = n_samples[trial]
+        pairs = ", ".join(f"[{p}, {t!r}]" for p, t in zip(sample_positions[:n, trial].tolist(),
+                                                            rounded_times[:n, trial].tolist()))
+        target = int(target_pos[trial])
+        # One row per trial, as stop_timer writes it when the first selection is the target
+        writer.writerow([first_participant + trial // trials_per_participant, _words[target], target, f"[{pairs}]",
+                         _words[target], "", 0, 0])
+    return out.getvalue()
+
+
+def simulate(output, lexicon_path, strategy, params=None, n_trials=100_000, seed=0, chunk_size=20_000,
+             trials_per_participant=5, first_participant=100_000, max_steps=200, capture=3, dwell_median=2.0,
+             dwell_spread=0.5, workers=None):
+    """Simulate `n_trials` searches and stream them to `output` in the results CSV format.
+
+    Chunks get independent seeds spawned from `seed`, so the output is identical whatever the number of workers;
+    at most a few chunks are held in memory at a time.
+    """
+    params = {**DEFAULT_PARAMS[strategy], **(params or {})}
+    chunk_size -= chunk_size % trials_per_participant  # Keep each simulated participant inside one chunk
+    seeds = np.random.SeedSequence(seed).spawn((n_trials + chunk_size - 1) // chunk_size)
+    tasks = []
+    for chunk, chunk_seed in enumerate(seeds):
+        start = chunk * chunk_size
+        tasks.append((strategy, params, min(chunk_size, n_trials - start), chunk_seed,
+                      first_participant + start // trials_per_participant, trials_per_participant, max_steps,
+                      capture, dwell_median, dwell_spread))
+
+    # Compile a .csv lexicon and build its tables here once, so the workers only map them
+    load_lexicon(lexicon_path).close()
+    load_tables(lexicon_path)
+    workers = workers or os.cpu_count()
+    with open(output, "w", newline="", encoding="utf-8") as f, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(lexicon_path,)) as pool:
+        csv.writer(f).writerow(RESULTS_HEADER)
+        window = 2 * workers  # Chunks in flight; results are written in order as they complete
+        for i in range(0, len(tasks), window):
+            for text in pool.map(simulate_chunk, tasks[i:i + window]):
+                f.write(text)
+    return output
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate search trials in the results CSV format")
+    parser.add_argument("--strategy", choices=list(DEFAULT_PARAMS), default="binary_search")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                        help="strategy parameter, e.g. --param sigma=0.05")
+    parser.add_argument("--trials", type=int, default=100_000)
+    parser.add_argument("--lexicon", default="petit_dictionaire.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--output", default="simulated_results.csv")
+    args = parser.parse_args()
+
+    params = {name: float(value) for name, value in (p.split("=", 1) for p in args.param)}
+    simulate(args.output, args.lexicon, args.strategy, params, args.trials, args.seed, workers=args.workers)
+    print(f"Wrote {args.trials} simulated trials to {args.output}")
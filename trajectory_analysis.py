@@ -0,0 +1,258 @@
+import csv
+import glob
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from lexicon_tables import load_tables
+from results_store import build_columns, load_results
+
+
+def load_trajectories(path="results", last_attempt_only=True):
+    """Load results into flat arrays sorted by trial, then step.
+
+    `path` is a results folder of CSVs or a store written by results_store.py or results_ingest.py. A trial is one
+    (session, participant, target); since each stop_timer row repeats the whole trajectory so far, only the last
+    attempt is kept by default. Canonical stores from results_ingest.py hold each sample once, so all their steps
+    are kept.
+    Positions are relative to target_word_pos (0 = on the target).
+    """
+    if os.path.isdir(path):
+        store = build_columns(sorted(glob.glob(os.path.join(path, "*.csv"))))
+    else:
+        store = load_results(path)
+
+    # Participants are part of the key because simulated session files hold several of them
+    participants, participant = np.unique(store["participant"], return_inverse=True)
+    n_targets = max(len(store["target_words"]), 1)
+    key = (store["session"].astype(np.int64) * len(participants) + participant) * n_targets + store["target"]
+    attempt = store["attempt"].astype(np.int64)
+    if not last_attempt_only:
+        key = key * (int(attempt.max(initial=0)) + 1) + attempt
+    order = np.lexsort((store["step"], attempt, key))
+    key, attempt = key[order], attempt[order]
+
+    starts = _group_starts(key)
+    if last_attempt_only and len(key) and not store.get("canonical", False):
+        last_attempt = np.maximum.reduceat(attempt, starts)
+        keep = attempt == np.repeat(last_attempt, np.diff(np.append(starts, len(key))))
+        order, key = order[keep], key[keep]
+        starts = _group_starts(key)
+
+    trial = np.zeros(len(key), dtype=np.int64)
+    trial[starts[1:]] = 1
+    trial = np.cumsum(trial)
+    trajectories = {name: store[name][order] for name in ("session", "participant", "target", "target_pos",
+                                                          "attempt", "position", "time")}
+    trajectories["trial"] = trial
+    trajectories["trial_start"] = starts
+    trajectories["target_words"] = store["target_words"]
+    trajectories["session_files"] = store["session_files"]
+    return trajectories
+
+
+def _group_starts(sorted_key):
+    if len(sorted_key) == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, sorted_key[1:] != sorted_key[:-1]])
+
+
+def trial_metrics(trajectories, k=10, tables=None):
+    """Per-trial search metrics, computed with grouped reductions over the flat arrays (no per-trial loop).
+
+    total_time         time of the last logged sample (s)
+    n_samples          logged samples
+    reversals          changes of movement direction between consecutive samples
+    overshoot          furthest distance past the target, on the side opposite to the first sample
+    log_distance_decay least-squares slope of log(1 + |position|) against time (per second; negative = closing in)
+    steps_to_k         index of the first sample within ±k words of the target (-1 if never)
+    time_to_k          time of that sample (NaN if never)
+
+    With the lexicon_tables.load_tables() records of the session lexicon, also:
+    first_guess_error      first sample minus the target's interpolation-search guess (NaN if the target is unknown)
+    first_in_letter_bucket 1 if the first sample is in the target's run of words sharing its first letter, 0 if not
+                           (-1 if unknown)
+    """
+    position = trajectories["position"].astype(np.int64)
+    t = trajectories["time"]
+    trial = trajectories["trial"]
+    starts = trajectories["trial_start"]
+    n_trials = len(starts)
+    if n_trials == 0:
+        return {}
+    counts = np.bincount(trial, minlength=n_trials)
+    ends = starts + counts - 1
+    step = np.arange(len(position)) - starts[trial]
+
+    metrics = {
+        "participant": trajectories["participant"][starts],
+        "target": trajectories["target"][starts],
+        "target_pos": trajectories["target_pos"][starts],
+        "session": trajectories["session"][starts],
+        "total_time": t[ends],
+        "n_samples": counts,
+    }
+
+    # Direction reversals: signs of the non-zero moves, compared with the previous move of the same trial
+    same_trial = trial[1:] == trial[:-1]
+    move = np.sign(np.diff(position))
+    moving = same_trial & (move != 0)
+    move, move_trial = move[moving], trial[1:][moving]
+    reversal = (move[1:] != move[:-1]) & (move_trial[1:] == move_trial[:-1])
+    metrics["reversals"] = np.bincount(move_trial[1:][reversal], minlength=n_trials)
+
+    # Overshoot: distance on the far side of the target relative to where the trial started
+    start_side = np.sign(position[starts])
+    past_target = -start_side[trial] * position
+    metrics["overshoot"] = np.maximum(np.maximum.reduceat(past_target, starts), 0)
+
+    # Decay of log distance: per-trial least-squares slope from grouped sums
+    y = np.log1p(np.abs(position))
+    sx, sy = np.bincount(trial, t, n_trials), np.bincount(trial, y, n_trials)
+    sxx, sxy = np.bincount(trial, t * t, n_trials), np.bincount(trial, t * y, n_trials)
+    denominator = counts * sxx - sx * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        metrics["log_distance_decay"] = np.where(denominator > 0, (counts * sxy - sx * sy) / denominator, np.nan)
+
+    # First sample within ±k words
+    within = np.abs(position) <= k
+    first = np.minimum.reduceat(np.where(within, step, np.iinfo(np.int64).max), starts)
+    reached = first != np.iinfo(np.int64).max
+    metrics["steps_to_k"] = np.where(reached, first, -1)
+    metrics["time_to_k"] = np.where(reached, t[starts + np.where(reached, first, 0)], np.nan)
+
+    if tables is not None:
+        # First jump compared with the precomputed guess and letter bucket of the target
+        target_pos = metrics["target_pos"].astype(np.int64)
+        landed = position[starts] + target_pos
+        known = (target_pos >= 0) & (target_pos < len(tables)) & (landed >= 0) & (landed < len(tables))
+        target_row = tables[np.where(known, target_pos, 0)]
+        metrics["first_guess_error"] = np.where(known, landed - target_row["interpolation_guess"], np.nan)
+        in_bucket = (landed >= target_row["letter_start"]) & (landed <= target_row["letter_end"])
+        metrics["first_in_letter_bucket"] = np.where(known, in_bucket, -1)
+    return metrics
+
+
+def resample(trajectories, n_bins=100, grid="time", method="hold", t_max=None, values=None, out=None,
+             max_memory_mb=512, chunk_trials=4096):
+    """Put every trial on a common grid; returns (grid points, trials x bins float32 matrix).
+
+    grid="time"      n_bins times from 0 to t_max seconds (default: the longest trial); NaN before a trial's first
+                     sample and after its last one
+    grid="progress"  n_bins points from each trial's first sample (0) to its last (1)
+    method="hold" keeps the last logged value, "linear" interpolates between consecutive samples. `values` replaces
+    the relative positions (e.g. np.log1p(np.abs(position))).
+
+    All trials are laid end to end on one sorted key (trial number + fraction of the trial's grid), so each chunk of
+    trials is resampled with a single searchsorted. The matrix is a memory-mapped .npy at `out`, or is mapped onto an
+    anonymous temporary file, released with the matrix, when it would exceed max_memory_mb.
+    """
+    t = trajectories["time"].astype(np.float64)
+    v = (trajectories["position"] if values is None else values).astype(np.float64)
+    trial = trajectories["trial"]
+    starts = trajectories["trial_start"]
+    n_trials = len(starts)
+    ends = np.append(starts[1:], len(t)) - 1
+    t_last = t[ends]
+
+    if grid == "time":
+        t_max = float(t_last.max(initial=0.0)) if t_max is None else float(t_max)
+        points = np.linspace(0.0, t_max, n_bins)
+        span = max(t_max, float(t.max(initial=0.0))) + 1.0
+        fraction, point_fraction = t / span, points / span
+    elif grid == "progress":
+        points = np.linspace(0.0, 1.0, n_bins)
+        t_first = t[starts]
+        duration = (t_last - t_first)[trial]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.where(duration > 0, (t - t_first[trial]) / duration, 0.0)
+        point_fraction = points
+    else:
+        raise ValueError(f"unknown grid {grid!r}")
+    if method not in ("hold", "linear"):
+        raise ValueError(f"unknown method {method!r}")
+    # Fractions stay below 1/2 so consecutive trials never overlap on the key
+    keys = trial + 0.5 * np.minimum(fraction, 1.0)
+
+    shape = (n_trials, n_bins)
+    if out is not None:
+        matrix = np.lib.format.open_memmap(out, mode="w+", dtype=np.float32, shape=shape)
+    elif n_trials * n_bins * 4 > max_memory_mb * 1024 * 1024:
+        # The mapping keeps its own handle, so the file has no name to leak once closed here
+        with tempfile.TemporaryFile(prefix="resampled_") as f:
+            matrix = np.memmap(f, mode="w+", dtype=np.float32, shape=shape)
+    else:
+        matrix = np.empty(shape, dtype=np.float32)
+
+    for first in range(0, n_trials, chunk_trials):
+        rows = np.arange(first, min(first + chunk_trials, n_trials))
+        query = rows[:, None] + 0.5 * point_fraction[None, :]
+        idx = np.searchsorted(keys, query, side="right") - 1
+        valid = idx >= starts[rows][:, None]
+        if grid == "time":
+            valid &= points[None, :] <= t_last[rows][:, None]
+        idx = np.maximum(idx, 0)
+        block = v[idx]
+        if method == "linear":
+            nxt = np.minimum(idx + 1, len(t) - 1)
+            step = fraction[nxt] - fraction[idx]
+            between = (nxt <= ends[rows][:, None]) & (step > 0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                weight = np.where(between, (point_fraction[None, :] - fraction[idx]) / step, 0.0)
+            block = block + np.clip(weight, 0.0, 1.0) * (v[nxt] - block)
+        matrix[rows] = np.where(valid, block, np.nan)
+    if isinstance(matrix, np.memmap):
+        matrix.flush()
+    return points, matrix
+
+
+def group_curves(matrix, groups=None, z=1.96, chunk_trials=4096):
+    """Per-group mean curve with its standard deviation, count and normal-approximation confidence band.
+
+    `groups` gives each trial's group (e.g. its participant); NaN bins are left out. The matrix is read one chunk
+    of trials at a time, so memory-mapped matrices are never loaded whole.
+    """
+    n_trials, n_bins = matrix.shape
+    if groups is None:
+        groups = np.zeros(n_trials, dtype=np.int64)
+    labels, codes = np.unique(groups, return_inverse=True)
+    count = np.zeros((len(labels), n_bins))
+    total = np.zeros((len(labels), n_bins))
+    total_sq = np.zeros((len(labels), n_bins))
+    for first in range(0, n_trials, chunk_trials):
+        block = np.asarray(matrix[first:first + chunk_trials], dtype=np.float64)
+        code = codes[first:first + chunk_trials]
+        present = ~np.isnan(block)
+        block = np.where(present, block, 0.0)
+        np.add.at(count, code, present)
+        np.add.at(total, code, block)
+        np.add.at(total_sq, code, block * block)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = total / count
+        sd = np.sqrt(np.maximum(total_sq / count - mean * mean, 0.0) * count / (count - 1))
+        half_width = z * sd / np.sqrt(count)
+    return {label.item(): {"mean": mean[i], "sd": sd[i], "n": count[i].astype(np.int64),
+                           "ci_low": mean[i] - half_width[i], "ci_high": mean[i] + half_width[i]}
+            for i, label in enumerate(labels)}
+
+
+def write_metrics(path, metrics, target_words):
+    names = list(metrics)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(names + ["target_word"])
+        for i in range(len(metrics["n_samples"])):
+            writer.writerow([metrics[name][i] for name in names] + [target_words[metrics["target"][i]]])
+
+
+if __name__ == "__main__":
+    results = sys.argv[1] if len(sys.argv) > 1 else "results"
+    lexicon_path = sys.argv[2] if len(sys.argv) > 2 else "petit_dictionaire.csv"
+    trajectories = load_trajectories(results)
+    metrics = trial_metrics(trajectories, tables=load_tables(lexicon_path))
+    output = "trial_metrics.csv"
+    write_metrics(output, metrics, trajectories["target_words"])
+    print(f"Wrote metrics for {len(trajectories['trial_start'])} trials to {output}")